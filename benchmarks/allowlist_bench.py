@@ -0,0 +1,56 @@
+# Lookup latency of the in-RAM and flash-backed allow-lists, for a hit and a
+# miss, with the RAM each one holds.
+#
+# Run from the repository root, on the host or on the board:
+#   python -m benchmarks.allowlist_bench
+import gc
+import os
+import time
+
+from utils.allowlist import AllowList, FlashAllowList, save
+
+N_CARDS = 20000
+N_LOOKUPS = 2000
+PATH = "allowlist_bench.bin"
+
+
+def now_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+
+def run(label, allowlist, tag):
+    gc.collect()
+    start = now_us()
+    for _ in range(N_LOOKUPS):
+        tag in allowlist
+    elapsed_us = max(now_us() - start, 1)
+    print("{:<22} {:>8.1f} us/lookup".format(label, elapsed_us / N_LOOKUPS))
+
+
+if __name__ == "__main__":
+    # spread the ids over the whole range, like real card numbers
+    tags = [(i * 2654435761) & 0xFFFFFFFF for i in range(1, N_CARDS + 1)]
+    save(PATH, tags)
+
+    gc.collect()
+    ram = AllowList(tags)
+    flash = FlashAllowList(PATH)
+    print(
+        "{} cards: {} bytes in RAM as array, {} bytes of page index for flash".format(
+            N_CARDS, 4 * len(ram), 4 * len(flash.index) + 4 * len(flash.page)
+        )
+    )
+
+    hit = tags[N_CARDS // 2]
+    miss = hit + 1 if hit + 1 not in ram else hit - 1
+    assert hit in flash and miss not in flash
+
+    run("RAM hit", ram, hit)
+    run("RAM miss", ram, miss)
+    run("flash hit", flash, hit)
+    run("flash miss", flash, miss)
+
+    flash.close()
+    os.remove(PATH)
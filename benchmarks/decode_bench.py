@@ -0,0 +1,62 @@
+# Frames per second of the lookup-table decoder against the previous
+# unhexlify/int() based parse_packet().
+#
+# Run from the repository root, on the host or on the board:
+#   python -m benchmarks.decode_bench
+import gc
+import time
+
+try:
+    import ubinascii
+except ImportError:
+    import binascii as ubinascii
+
+from utils.rfid import ReaderStats, RFIDReader
+
+FRAME = bytearray(b"\x020A00611CD8AF\x03")
+N_FRAMES = 20000
+
+
+def now_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+
+def legacy_parse_packet(packet):
+    if len(packet) != 14 or packet[0] != 0x02 or packet[13] != 0x03:
+        return None
+
+    card_data = packet[1:11]
+    checksum = packet[11:13]
+    calculated_checksum = 0
+    for x in ubinascii.unhexlify(card_data):
+        calculated_checksum = calculated_checksum ^ x
+
+    if int(chr(checksum[0]) + chr(checksum[1]), 16) != calculated_checksum:
+        return None
+
+    return str(int(card_data[2:].decode("ascii"), 16))
+
+
+def run(label, parse):
+    gc.collect()
+    start = now_us()
+    for _ in range(N_FRAMES):
+        parse(FRAME)
+    elapsed_us = max(now_us() - start, 1)
+    print(
+        "{:<22} {:>9.0f} frames/s".format(label, N_FRAMES * 1000000 / elapsed_us)
+    )
+
+
+if __name__ == "__main__":
+    reader = RFIDReader.__new__(RFIDReader)
+    reader.log_enabled = False
+    reader.stats = ReaderStats()
+
+    assert legacy_parse_packet(FRAME) == reader.parse_packet(FRAME)
+
+    run("legacy parse_packet", legacy_parse_packet)
+    run("parse_packet (str)", reader.parse_packet)
+    run("parse_tag (int)", reader.parse_tag)
@@ -0,0 +1,73 @@
+# Throughput of the streaming frame decoder against whole-chunk parsing.
+#
+# Run from the repository root, on the host or on the board:
+#   python -m benchmarks.frame_decoder_bench
+import random
+import time
+
+from utils.rfid import FrameDecoder, ReaderStats, RFIDReader
+
+FRAMES = [
+    b"\x020A00611CD8AF\x03",
+    b"\x021E009A4F3CF7\x03",
+    b"\x0201006135A2F7\x03",
+]
+N_FRAMES = 5000
+
+
+def now_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+
+def make_stream(chunker):
+    data = b"".join(FRAMES[i % len(FRAMES)] for i in range(N_FRAMES))
+    chunks = []
+    i = 0
+    while i < len(data):
+        n = chunker()
+        chunks.append(data[i : i + n])
+        i += n
+    return chunks
+
+
+def whole_chunk(reader, chunks):
+    found = 0
+    for chunk in chunks:
+        if reader.parse_packet(chunk) is not None:
+            found += 1
+    return found
+
+
+def streaming(reader, chunks):
+    decoder = FrameDecoder()
+    found = 0
+    for chunk in chunks:
+        for frame in decoder.feed(chunk):
+            if reader.parse_packet(frame) is not None:
+                found += 1
+    return found
+
+
+def run(name, chunks):
+    reader = RFIDReader.__new__(RFIDReader)
+    reader.log_enabled = False
+    reader.stats = ReaderStats()
+
+    for label, parse in (("whole-chunk", whole_chunk), ("streaming", streaming)):
+        start = now_us()
+        found = parse(reader, chunks)
+        elapsed_us = max(now_us() - start, 1)
+        print(
+            "{:<14} {:<12} {:>5}/{} frames  {:>9.0f} frames/s".format(
+                name, label, found, N_FRAMES, found * 1000000 / elapsed_us
+            )
+        )
+
+
+if __name__ == "__main__":
+    random.seed(6300)
+    run("aligned", make_stream(lambda: 14))
+    run("fragmented", make_stream(lambda: random.randint(1, 13)))
+    run("concatenated", make_stream(lambda: random.randint(15, 64)))
@@ -0,0 +1,297 @@
+# End-to-end latency and throughput of the RFID API. The webserver from
+# utils/webserver.py runs on CPython in a thread, reading from a simulated
+# RDM6300 (see host/), while concurrent keep-alive clients drive one endpoint
+# at a time. Tag-to-client latency is from the simulated module sending a
+# frame to the client holding the response or event for its tag.
+#
+# The results are compared with benchmarks/baselines.json, and the exit
+# status is 1 if a gated value (see GATED) got worse by more than the
+# tolerance. The tails of tag-to-client latency depend on how the threads
+# get scheduled and request p99 is too noisy in runs this short, so they
+# are reported but not gated on. Baselines depend on the machine, store new
+# ones with --update after a change that is meant to move them.
+#
+# Run from the repository root on the host:
+#   python -m benchmarks.http_bench
+#   python -m benchmarks.http_bench --clients 8 --duration 10
+#   python -m benchmarks.http_bench --update
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from host import run as host_run
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+HOST = "127.0.0.1"
+FIRST_TAG = 10000000
+N_TAGS = 64  # cycled through, so no tag comes back within the debounce window
+LATENCY_SLACK_MS = 1.0  # differences below this are noise, not regressions
+GATED = ("rps", "p50_ms", "p95_ms", "tag_p50_ms")
+
+ENDPOINTS = (
+    ("lookup", "/allowlist/6364376"),
+    ("read", "/read"),
+    ("read_chip", "/read/chip/{tag}"),
+    ("stream", "/read/stream"),
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, p):
+    # Nearest rank, values sorted
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def summarize(latencies_ns, tag_latencies_ns, count, elapsed_s):
+    result = {"rps": round(count / elapsed_s, 1)}
+    for prefix, values in (("", latencies_ns), ("tag_", tag_latencies_ns)):
+        values.sort()
+        for p in (50, 95, 99):
+            value = percentile(values, p)
+            if value is not None:
+                result["{}p{}_ms".format(prefix, p)] = round(value / 1000000, 2)
+    return result
+
+
+class Server:
+    # The webserver of utils/webserver.py with its own event loop, in a thread
+    def __init__(self, port, data_dir):
+        host_run.install()
+        CONF = host_run.configure(HOST, port, data_dir)
+        CONF.LOG_LEVEL = "WARNING"
+
+        import utils.webserver as api
+
+        self.api = api
+        self.loop = None
+        self.thread = threading.Thread(target=asyncio.run, args=(self.serve(),))
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        await self.api.main()
+
+    def start(self):
+        self.thread.start()
+        app = self.api.app
+        while app.server is None or not app.server.sockets:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.api.app.shutdown)
+        self.thread.join(5)
+
+
+def upcoming_tag(module):
+    # One of the next few tags the module sends, so /read/chip waits for a
+    # frame or two instead of the whole cycle
+    last = module.last_sent[0] if module.last_sent else FIRST_TAG
+    return FIRST_TAG + (last - FIRST_TAG + random.randint(1, 3)) % N_TAGS
+
+
+async def get(reader, writer, path):
+    # One keep-alive GET, returns (status, body, closed)
+    writer.write("GET {} HTTP/1.1\r\nHost: bench\r\n\r\n".format(path).encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    closed = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"connection":
+            closed = value.strip().lower() == b"close"
+    return status, await reader.readexactly(length), closed
+
+
+async def drive_requests(port, path, module, clients, duration_s):
+    latencies = []
+    tag_latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration_s
+
+    async def client():
+        nonlocal errors
+        connection = None
+        while time.perf_counter() < deadline:
+            if connection is None:
+                connection = await asyncio.open_connection(HOST, port)
+            url = path.format(tag=upcoming_tag(module))
+
+            start = time.perf_counter_ns()
+            status, body, closed = await get(*connection, url)
+            end = time.perf_counter_ns()
+
+            if status != 200:
+                errors += 1
+            latencies.append(end - start)
+            data = json.loads(body)
+            if "found" in data:
+                sent = module.sent.get(int(data["id"]))
+                if sent is not None:
+                    tag_latencies.append(end - sent)
+            if closed:
+                connection[1].close()
+                connection = None
+
+        if connection is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    result = summarize(
+        latencies, tag_latencies, len(latencies), time.perf_counter() - start
+    )
+    result["errors"] = errors
+    return result
+
+
+async def drive_stream(port, path, module, clients, duration_s):
+    # Events are counted until the deadline, then the clients read on until
+    # the server ends the stream, so it is not cut off mid-write
+    tag_latencies = []
+    deadline = time.perf_counter() + duration_s
+
+    async def client():
+        reader, writer = await asyncio.open_connection(HOST, port)
+        # the stream timeout is a form field, the server ends it at the deadline
+        form = "timeout={}".format(math.ceil(duration_s)).encode()
+        writer.write(
+            "GET {} HTTP/1.1\r\nHost: bench\r\n"
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            "Content-Length: {}\r\n\r\n".format(path, len(form)).encode()
+            + form
+        )
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"data: ") and time.perf_counter() < deadline:
+                    end = time.perf_counter_ns()
+                    sent = module.sent.get(int(json.loads(line[6:])["id"]))
+                    if sent is not None:
+                        tag_latencies.append(end - sent)
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summarize([], tag_latencies, len(tag_latencies), duration_s)
+
+
+def run(clients, duration_s, rate_hz):
+    # The module, the server and the clients share the GIL. Switching threads
+    # more often than every 5 ms keeps that out of the tag-to-client times.
+    sys.setswitchinterval(0.0002)
+    server = Server(free_port(), tempfile.mkdtemp(prefix="http-bench-"))
+    server.start()
+    module = host_run.start_reader(
+        tags=range(FIRST_TAG, FIRST_TAG + N_TAGS), rate_hz=rate_hz, seed=6300
+    )
+    port = server.api.CONF.PORT
+
+    results = {}
+    try:
+        for name, path in ENDPOINTS:
+            drive = drive_stream if name == "stream" else drive_requests
+            result = asyncio.run(drive(port, path, module, clients, duration_s))
+            results[name] = result
+            print_result(name, result)
+    finally:
+        module.stop()
+        server.stop()
+    return results
+
+
+def print_result(name, result):
+    print(
+        "{:<10} {:>8} req/s  p50 {:>7} p95 {:>7} p99 {:>7} ms"
+        "  tag-to-client p50 {:>7} p95 {:>7} p99 {:>7} ms".format(
+            name,
+            result["rps"],
+            *(
+                result.get(key, "-")
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+                + ("tag_p50_ms", "tag_p95_ms", "tag_p99_ms")
+            )
+        )
+    )
+
+
+def compare(results, baselines, tolerance):
+    # Lines describing every result worse than its baseline beyond tolerance
+    regressions = []
+    for name, result in results.items():
+        for key, baseline in baselines.get(name, {}).items():
+            value = result.get(key)
+            if value is None or key not in GATED:
+                continue
+            if key == "rps":
+                worse = value < baseline * (1 - tolerance)
+            else:
+                worse = value > baseline * (1 + tolerance) + LATENCY_SLACK_MS
+            if worse:
+                regressions.append(
+                    "{} {}: {} against a baseline of {}".format(
+                        name, key, value, baseline
+                    )
+                )
+        if result.get("errors"):
+            regressions.append("{}: {} failed requests".format(name, result["errors"]))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5, help="per endpoint")
+    parser.add_argument("--rate", type=float, default=50, help="tag frames per second")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update", action="store_true", help="store as baselines")
+    args = parser.parse_args(argv)
+
+    results = run(args.clients, args.duration, args.rate)
+
+    if args.update:
+        with open(args.baselines, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print("Stored baselines in {}".format(args.baselines))
+        return 0
+
+    try:
+        with open(args.baselines) as file:
+            baselines = json.load(file)
+    except OSError:
+        print("No baselines in {}, run with --update".format(args.baselines))
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print("No regressions beyond {:.0%} of the baselines".format(args.tolerance))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
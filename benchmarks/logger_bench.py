@@ -0,0 +1,86 @@
+# Logging cost of one /read request (three debug messages) with the previous
+# f-string/print() logger and the level-gated one, at INFO and at DEBUG.
+# Output goes to a null stream, so only formatting and dispatch are measured.
+#
+# Run from the repository root, on the host or on the board:
+#   python -m benchmarks.logger_bench
+import gc
+import time
+
+try:
+    import utime
+except ImportError:
+    import time as utime
+
+from utils.logger import Logger
+
+N_REQUESTS = 5000
+
+
+class NullStream:
+    def write(self, data):
+        return len(data)
+
+
+def now_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return time.perf_counter_ns() // 1000
+
+
+class LegacyLogger:
+    def __init__(self, log_level, stream):
+        self.log_levels = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3}
+        self.current_level = log_level
+        self.enabled_levels = {level: True for level in self.log_levels}
+        self.stream = stream
+
+    def log(self, level, message):
+        if level in self.log_levels:
+            if (
+                self.log_levels[level] >= self.log_levels[self.current_level]
+                and self.enabled_levels[level]
+            ):
+                timestamp = utime.localtime()
+                timestamp_str = "{:04}-{:02}-{:02} {:02}:{:02}:{:02}".format(
+                    timestamp[0],
+                    timestamp[1],
+                    timestamp[2],
+                    timestamp[3],
+                    timestamp[4],
+                    timestamp[5],
+                )
+                self.stream.write(
+                    "[{}] [{}] {}\n".format(timestamp_str, level, message)
+                )
+
+    def debug(self, message):
+        self.log("DEBUG", message)
+
+
+def legacy_request(logger, client_timeout, event):
+    logger.debug(f"Client timeout is {client_timeout}")
+    logger.debug(f"Using timeout set to {client_timeout}")
+    logger.debug(f"Read returned with data {event}")
+
+
+def lazy_request(logger, client_timeout, event):
+    logger.debug("Client timeout is {}", client_timeout)
+    logger.debug("Using timeout set to {}", client_timeout)
+    logger.debug("Read returned with data {}", event)
+
+
+def run(label, request, logger):
+    event = (12, 6364376, 123456, None, 1)
+    gc.collect()
+    start = now_us()
+    for _ in range(N_REQUESTS):
+        request(logger, "30", event)
+    elapsed_us = max(now_us() - start, 1)
+    print("{:<16} {:>8.2f} us/request".format(label, elapsed_us / N_REQUESTS))
+
+
+if __name__ == "__main__":
+    for level in ("INFO", "DEBUG"):
+        run("legacy " + level, legacy_request, LegacyLogger(level, NullStream()))
+        run("lazy " + level, lazy_request, Logger(level, NullStream()))
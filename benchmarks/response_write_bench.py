@@ -0,0 +1,75 @@
+# Writes per response for Response.write(), against the previous
+# one-write-per-header implementation. On CPython every awrite() is a
+# write() plus drain(), i.e. one send() syscall; on the Pico it is one lwIP
+# segment.
+#
+# Run from the repository root:
+#   python -m benchmarks.response_write_bench
+import asyncio
+import time
+
+from microdot import Response
+
+N_RESPONSES = 2000
+
+
+class CountingStream:
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    async def awrite(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+
+
+async def legacy_write(response, stream):
+    response.complete()
+    await stream.awrite(
+        "HTTP/1.0 {} {}\r\n".format(response.status_code, "OK").encode()
+    )
+    for header, value in response.headers.items():
+        await stream.awrite("{}: {}\r\n".format(header, value).encode())
+    await stream.awrite(b"\r\n")
+    await stream.awrite(response.body)
+
+
+def make_responses():
+    return {
+        "json /read": lambda: Response(
+            {"found": True, "id": "6364376"},
+            headers={"Content-Type": "application/json", "Connection": "close"},
+        ),
+        "html /": lambda: Response(
+            "<html>" + "x" * 3000 + "</html>",
+            headers={"Content-Type": "text/html", "Connection": "close"},
+        ),
+    }
+
+
+async def measure(write, make_response):
+    stream = CountingStream()
+    start = time.perf_counter()
+    for _ in range(N_RESPONSES):
+        await write(make_response(), stream)
+    elapsed = time.perf_counter() - start
+    return stream.writes / N_RESPONSES, stream.bytes / N_RESPONSES, elapsed
+
+
+async def main():
+    async def current_write(response, stream):
+        await response.write(stream)
+
+    for name, make_response in make_responses().items():
+        for label, write in (("legacy", legacy_write), ("coalesced", current_write)):
+            writes, size, elapsed = await measure(write, make_response)
+            print(
+                "{:<11} {:<10} {:>4.1f} writes/response  {:>6.0f} bytes  "
+                "{:>6.1f} us/response".format(
+                    name, label, writes, size, elapsed * 1e6 / N_RESPONSES
+                )
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+# Route lookup cost with a few hundred registered routes: the compiled
+# RouteTable used by Microdot.find_route() against the previous linear scan
+# over url_map with URLPattern.match().
+#
+# Run from the repository root:
+#   python -m benchmarks.route_bench
+import time
+
+from microdot import Microdot
+
+N_LOOKUPS = 20000
+
+
+class Req:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.url_args = None
+
+
+def handler(req, **kwargs):
+    pass
+
+
+def make_app(n_groups):
+    app = Microdot()
+    for i in range(n_groups):
+        app.route("/status/{}".format(i))(handler)
+        app.route("/config/{}/<key>".format(i), methods=["GET", "PUT"])(handler)
+        app.route("/admin/{}/users/<int:id>".format(i))(handler)
+    app.route("/read")(handler)
+    app.route("/read/chip/<chip_id>")(handler)
+    return app
+
+
+def linear_find_route(app, req):
+    f = 404
+    for route_methods, route_pattern, route_handler in app.url_map:
+        req.url_args = route_pattern.match(req.path)
+        if req.url_args is not None:
+            if req.method in route_methods:
+                f = route_handler
+                break
+            else:
+                f = 405
+    return f
+
+
+def run(n_groups):
+    app = make_app(n_groups)
+    paths = [
+        "/read",
+        "/read/chip/6364376",
+        "/status/{}".format(n_groups - 1),
+        "/admin/{}/users/42".format(n_groups // 2),
+        "/missing/path",
+    ]
+    for label, find in (
+        ("linear", lambda req: linear_find_route(app, req)),
+        ("compiled", app.find_route),
+    ):
+        start = time.perf_counter()
+        for i in range(N_LOOKUPS):
+            find(Req("GET", paths[i % len(paths)]))
+        elapsed = time.perf_counter() - start
+        print(
+            "{:>4} routes  {:<9} {:>7.2f} us/lookup".format(
+                len(app.url_map), label, elapsed * 1e6 / N_LOOKUPS
+            )
+        )
+
+
+if __name__ == "__main__":
+    for n_groups in (1, 10, 100):
+        run(n_groups)
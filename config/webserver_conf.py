@@ -3,7 +3,16 @@ PORT = 80
 
 MICRODOT_DEBUG = True
 LOG_LEVEL = "DEBUG"
+LOG_RING_SIZE = 4096
+LOG_FILE = None  # e.g. "log.txt" to keep logs on flash
+LOG_HTTP_HOST = None  # collector that receives log batches as POST /logs
+LOG_HTTP_PORT = 80
 
 RFID_READER_GPIO = 1
 LED_GREEN_GPIO = 10
 LED_RED_GPIO = 15
+
+ALLOWLIST_PATH = "allowlist.bin"
+
+JOURNAL_PATH = "journal.bin"
+JOURNAL_MAX_SIZE = 64 * 1024
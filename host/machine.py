@@ -0,0 +1,164 @@
+# Stand-in for the MicroPython machine module, so utils/ runs on CPython.
+# Only what the firmware uses is provided. A UART receives whatever is sent
+# on the wire of its id, e.g. by host/rdm6300.py, and its RX idle IRQ handler
+# is called from the sending thread like the hardware interrupt would be.
+import threading
+import time
+
+
+class Wire:
+    # The RX line and IRQ setting of one UART id, which like the peripheral
+    # is shared by all UART objects of that id
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = bytearray()
+        self.uart = None
+        self.handler = None
+        self.trigger = 0
+
+    def send(self, data):
+        with self.lock:
+            self.buffer += data
+        handler = self.handler
+        if handler is not None and self.trigger & UART.IRQ_RXIDLE:
+            handler(self.uart)
+
+    def clear(self):
+        with self.lock:
+            self.buffer = bytearray()
+
+
+wires = {}
+
+
+def wire(uart_id):
+    if uart_id not in wires:
+        wires[uart_id] = Wire()
+    return wires[uart_id]
+
+
+class UART:
+    IRQ_RXIDLE = 0x1000
+
+    def __init__(self, id, baudrate=9600, **kwargs):
+        self.id = id
+        self.wire = wire(id)
+        self.init(baudrate, **kwargs)
+
+    def init(self, baudrate=9600, bits=8, parity=None, stop=1, **kwargs):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        self.irq(handler=None)
+
+    def any(self):
+        return len(self.wire.buffer)
+
+    def read(self, nbytes=None):
+        with self.wire.lock:
+            buffer = self.wire.buffer
+            if not buffer:
+                return None
+            n = len(buffer) if nbytes is None else min(nbytes, len(buffer))
+            data = bytes(buffer[:n])
+            del buffer[:n]
+        return data
+
+    def readinto(self, buf, nbytes=None):
+        data = self.read(len(buf) if nbytes is None else min(nbytes, len(buf)))
+        if data is None:
+            return None
+        buf[: len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        # TX is not connected to anything
+        return len(data)
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        self.wire.uart = self
+        self.wire.handler = handler
+        self.wire.trigger = trigger
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=None, value=None, **kwargs):
+        self.id = id
+        self.state = 0
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=None, value=None, **kwargs):
+        if mode != -1:
+            self.mode = mode
+        if value is not None:
+            self.state = 1 if value else 0
+
+    def value(self, value=None):
+        if value is None:
+            return self.state
+        self.state = 1 if value else 0
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def on(self):
+        self.state = 1
+
+    def off(self):
+        self.state = 0
+
+    def toggle(self):
+        self.state ^= 1
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        pass
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.timer = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=-1, period=-1, callback=None):
+        self.deinit()
+        self.mode = mode
+        self.period_s = 1 / freq if freq > 0 else period / 1000
+        self.callback = callback
+        self.schedule()
+
+    def schedule(self):
+        self.timer = threading.Timer(self.period_s, self.fire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def fire(self):
+        if self.mode == Timer.PERIODIC:
+            self.schedule()
+        if self.callback is not None:
+            self.callback(self)
+
+    def deinit(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
+def idle():
+    time.sleep(0.001)
+
+
+def freq():
+    return 125000000
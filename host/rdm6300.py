@@ -0,0 +1,120 @@
+# Simulated RDM6300 module for host runs and load tests. It sends frames on a
+# Wire from host/machine.py, where the UART the reader opened receives them.
+import random
+import threading
+import time
+
+FRAME_HEADER = b"\x02"
+FRAME_STOP = b"\x03"
+VERSION = 0x0A
+
+
+def make_frame(tag, version=VERSION, bad_checksum=False):
+    # 0x02, ten hex digits of version and tag, two of their XOR, 0x03
+    data = [version] + [(tag >> shift) & 0xFF for shift in (24, 16, 8, 0)]
+    checksum = 0
+    for value in data:
+        checksum ^= value
+    if bad_checksum:
+        checksum ^= 0x5A
+    digits = "".join("{:02X}".format(value) for value in data + [checksum])
+    return FRAME_HEADER + digits.encode() + FRAME_STOP
+
+
+class RDM6300:
+    # While running, a thread sends a frame for the current tag rate_hz times
+    # a second. Each tag is repeated repeats times, like a card held in the
+    # field, before the next one in tags. A frame is split into chunks of a
+    # random size in chunk (min, max) that take as long as the bytes would
+    # on the wire at baudrate (None sends at once). noise and bad_checksum are
+    # the chances per frame of 1-4 random bytes before it and of a corrupted
+    # checksum. last_sent is (tag, time.perf_counter_ns()) of the last good
+    # frame's stop byte leaving the module, sent maps each tag to that time
+    # for its last good frame.
+    def __init__(
+        self,
+        wire,
+        tags=(6364376,),
+        rate_hz=10,
+        repeats=1,
+        chunk=(14, 14),
+        noise=0.0,
+        bad_checksum=0.0,
+        baudrate=9600,
+        seed=None,
+    ):
+        self.wire = wire
+        self.tags = list(tags)
+        self.rate_hz = rate_hz
+        self.repeats = repeats
+        self.chunk = chunk
+        self.noise = noise
+        self.bad_checksum = bad_checksum
+        self.baudrate = baudrate
+        self.random = random.Random(seed)
+
+        self.frames = 0
+        self.corrupted = 0
+        self.noise_bytes = 0
+        self.last_sent = None
+        self.sent = {}
+        self.running = False
+        self.thread = None
+
+    def transmit(self, data):
+        i = 0
+        while i < len(data):
+            n = self.random.randint(*self.chunk)
+            part = data[i : i + n]
+            if self.baudrate:
+                # 8N1 is ten bit times per byte
+                time.sleep(len(part) * 10 / self.baudrate)
+            self.wire.send(part)
+            i += n
+
+    def send(self, tag, bad_checksum=False):
+        # Sends one frame for tag now, from the calling thread
+        if self.noise and self.random.random() < self.noise:
+            garbage = bytes(
+                self.random.randrange(256) for _ in range(self.random.randint(1, 4))
+            )
+            self.noise_bytes += len(garbage)
+            self.transmit(garbage)
+
+        if self.bad_checksum and self.random.random() < self.bad_checksum:
+            bad_checksum = True
+        self.transmit(make_frame(tag, bad_checksum=bad_checksum))
+
+        self.frames += 1
+        if bad_checksum:
+            self.corrupted += 1
+        else:
+            self.last_sent = (tag, time.perf_counter_ns())
+            self.sent[tag] = self.last_sent[1]
+
+    def run(self):
+        period = 1 / self.rate_hz if self.rate_hz else 0
+        deadline = time.perf_counter()
+        while self.running:
+            for tag in self.tags:
+                for _ in range(self.repeats):
+                    if not self.running:
+                        return
+                    self.send(tag)
+                    deadline += period
+                    delay = deadline - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        deadline = time.perf_counter()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
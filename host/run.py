@@ -0,0 +1,102 @@
+# Runs firmware from this repository on CPython: host/ stands in for the
+# MicroPython modules and a simulated RDM6300 sends on UART 0. By default
+# main.py is run, which serves the webserver on 127.0.0.1:8080, with the
+# allow-list and journal kept in a temporary directory.
+#
+# Run from the repository root:
+#   python host/run.py
+#   python host/run.py --tags 6364376,6364377 --rate 5 --noise 0.1
+#   python host/run.py --repeats 20 test/rfid_test.py
+import argparse
+import os
+import runpy
+import sys
+import tempfile
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(HOST_DIR)
+
+
+def install():
+    # host/ goes first, so machine, utime etc. resolve to the stand-ins
+    for path in (ROOT_DIR, HOST_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+
+def in_dir(directory, path):
+    return os.path.join(directory, os.path.basename(path))
+
+
+def configure(host="127.0.0.1", port=8080, data_dir=None, debug=False):
+    # Points config.webserver_conf at the host, before the webserver is imported
+    import config.webserver_conf as CONF
+
+    if data_dir is None:
+        data_dir = tempfile.mkdtemp(prefix="rdm6300-")
+    CONF.HOST = host
+    CONF.PORT = port
+    CONF.MICRODOT_DEBUG = debug
+    CONF.ALLOWLIST_PATH = in_dir(data_dir, CONF.ALLOWLIST_PATH)
+    CONF.JOURNAL_PATH = in_dir(data_dir, CONF.JOURNAL_PATH)
+    if CONF.LOG_FILE is not None:
+        CONF.LOG_FILE = in_dir(data_dir, CONF.LOG_FILE)
+    return CONF
+
+
+def start_reader(uart_id=0, **kwargs):
+    # Starts a simulated RDM6300 on the UART, see host/rdm6300.py for kwargs
+    import machine
+    from rdm6300 import RDM6300
+
+    module = RDM6300(machine.wire(uart_id), **kwargs)
+    module.start()
+    return module
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", nargs="?", default="main", help="module or script")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", help="where the allow-list and journal go")
+    parser.add_argument("--debug", action="store_true", help="log every request")
+    parser.add_argument("--no-reader", action="store_true", help="no simulated tags")
+    parser.add_argument("--tags", default="6364376", help="comma separated card ids")
+    parser.add_argument("--rate", type=float, default=2, help="frames per second")
+    parser.add_argument("--repeats", type=int, default=1, help="frames per tag")
+    parser.add_argument("--chunk", default="14,14", help="min,max bytes per write")
+    parser.add_argument("--noise", type=float, default=0.0, help="chance per frame")
+    parser.add_argument("--bad-checksum", type=float, default=0.0, help="chance")
+    parser.add_argument("--baudrate", type=int, default=9600, help="0 for no pacing")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    install()
+    configure(args.host, args.port, args.data_dir, args.debug)
+
+    if not args.no_reader:
+        start_reader(
+            tags=[int(tag) for tag in args.tags.split(",")],
+            rate_hz=args.rate,
+            repeats=args.repeats,
+            chunk=tuple(int(n) for n in args.chunk.split(",")),
+            noise=args.noise,
+            bad_checksum=args.bad_checksum,
+            baudrate=args.baudrate,
+            seed=args.seed,
+        )
+
+    if args.target.endswith(".py"):
+        runpy.run_path(args.target, run_name="__main__")
+    else:
+        runpy.run_module(args.target, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
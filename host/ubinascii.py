@@ -0,0 +1,2 @@
+# Stand-in for MicroPython's ubinascii on CPython
+from binascii import a2b_base64, b2a_base64, crc32, hexlify, unhexlify  # noqa: F401
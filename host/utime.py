@@ -0,0 +1,36 @@
+# Stand-in for MicroPython's utime on CPython. Ticks wrap around like they do
+# on the board, so code that forgets ticks_diff() fails here too.
+import time as _time
+from time import gmtime, localtime, mktime, sleep, time  # noqa: F401
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+def ticks_ms():
+    return (_time.monotonic_ns() // 1000000) & TICKS_MAX
+
+
+def ticks_us():
+    return (_time.monotonic_ns() // 1000) & TICKS_MAX
+
+
+def ticks_cpu():
+    return _time.perf_counter_ns() & TICKS_MAX
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
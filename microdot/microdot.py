@@ -356,6 +356,8 @@ class Request:
         #: A general purpose container for applications to store data during
         #: the life of the request.
         self.g = Request.G()
+        #: The URL pattern of the route that matched the request, or ``None``.
+        self.route = None
 
         self.http_version = http_version
         if '?' in self.path:
@@ -542,6 +544,10 @@ class Response:
 
     send_file_buffer_size = 1024
 
+    #: Bodies up to this many bytes are written in the same ``awrite()`` call
+    #: as the status line and headers. Larger bodies are written separately.
+    coalesce_body_length = 1024
+
     #: The content type to use for responses that do not explicitly define a
     #: ``Content-Type`` header.
     default_content_type = 'text/plain'
@@ -634,36 +640,63 @@ class Response:
         self.complete()
 
         try:
-            # status code
+            # status line and headers go out in a single write, together with
+            # the body when it is small, so that a typical JSON response
+            # needs one TCP segment instead of one per header
             reason = self.reason if self.reason is not None else \
                 ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
+            lines = ['HTTP/1.1 {status_code} {reason}\r\n'.format(
+                status_code=self.status_code, reason=reason)]
 
+            written = 0
             # headers
             for header, value in self.headers.items():
                 values = value if isinstance(value, list) else [value]
                 for value in values:
-                    await stream.awrite('{header}: {value}\r\n'.format(
-                        header=header, value=value).encode())
-            await stream.awrite(b'\r\n')
+                    lines.append('{header}: {value}\r\n'.format(
+                        header=header, value=value))
+            lines.append('\r\n')
+            head = ''.join(lines).encode()
+
+            if isinstance(self.body, bytes):
+                if self.is_head:
+                    await stream.awrite(head)
+                    return len(head)
+                elif len(self.body) <= self.coalesce_body_length:
+                    await stream.awrite(head + self.body)
+                else:
+                    await stream.awrite(head)
+                    await stream.awrite(self.body)
+                return len(head) + len(self.body)
 
-            # body
-            if not self.is_head:
-                iter = self.body_iter()
-                async for body in iter:
-                    if isinstance(body, str):  # pragma: no cover
-                        body = body.encode()
-                    try:
-                        await stream.awrite(body)
-                    except OSError as exc:  # pragma: no cover
-                        if exc.errno in MUTED_SOCKET_ERRORS or \
-                                exc.args[0] == 'Connection lost':
-                            if hasattr(iter, 'aclose'):
-                                await iter.aclose()
-                        raise
+            # a body that is not going to be sent is still closed, so that it
+            # releases what it holds (files, subscriptions, ...)
+            iter = self.body_iter()
+            try:
+                await stream.awrite(head)
+            except OSError:
+                if hasattr(iter, 'aclose'):  # pragma: no branch
+                    await iter.aclose()
+                raise
+            written = len(head)
+            if self.is_head:
                 if hasattr(iter, 'aclose'):  # pragma: no branch
                     await iter.aclose()
+                return written
+
+            # body
+            async for body in iter:
+                if isinstance(body, str):  # pragma: no cover
+                    body = body.encode()
+                try:
+                    await stream.awrite(body)
+                    written += len(body)
+                except OSError:  # pragma: no cover
+                    if hasattr(iter, 'aclose'):
+                        await iter.aclose()
+                    raise
+            if hasattr(iter, 'aclose'):  # pragma: no branch
+                await iter.aclose()
 
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
@@ -671,6 +704,7 @@ class Response:
                 pass
             else:
                 raise
+        return written
 
     def body_iter(self):
         if hasattr(self.body, '__anext__'):
@@ -889,6 +923,144 @@ class URLPattern():
             return None, None
 
 
+class RouteTable():
+    """Routes compiled for lookup at registration time.
+
+    Static URLs are found with a single dictionary lookup. URLs with
+    ``string`` or ``int`` components are stored in a tree with one level per
+    path segment, where static segments take precedence over dynamic ones.
+    Only patterns that need a regular expression (``path`` and ``re:``
+    components) are matched one by one. Each match resolves to an index of
+    handlers by HTTP method.
+    """
+    def __init__(self):
+        self.static = {}
+        self.root = self._node()
+        self.regex_routes = []
+
+    @staticmethod
+    def _node():
+        # [static children by segment, [(type, child)], {method: handler}]
+        return [{}, [], None]
+
+    def add(self, methods, pattern, handler):
+        if pattern.regex:
+            self.regex_routes.append((methods, pattern, handler))
+            return
+        route = pattern.url_pattern
+        names = [segment['name'] for segment in pattern.segments
+                 if 'name' in segment]
+        if not names:
+            leaf = self.static.setdefault(
+                '/' + pattern.url_pattern.lstrip('/'), {})
+        else:
+            node = self.root
+            for segment, value in zip(
+                    pattern.segments,
+                    pattern.url_pattern.lstrip('/').split('/')):
+                if 'name' in segment:
+                    for type_, child in node[1]:
+                        if type_ == segment['type']:
+                            break
+                    else:
+                        child = self._node()
+                        node[1].append((segment['type'], child))
+                else:
+                    child = node[0].get(value)
+                    if child is None:
+                        child = node[0][value] = self._node()
+                node = child
+            if node[2] is None:
+                node[2] = {}
+            leaf = node[2]
+        for method in methods:
+            if method not in leaf:
+                leaf[method] = (handler, names, route)
+
+    def _walk(self, node, segments, i, values, visit):
+        if i == len(segments):
+            if node[2] is not None:
+                return visit(node[2], values)
+            return None
+        segment = segments[i]
+        child = node[0].get(segment)
+        if child is not None:
+            found = self._walk(child, segments, i + 1, values, visit)
+            if found is not None:
+                return found
+        for type_, child in node[1]:
+            if type_ == 'int':
+                try:
+                    value = int(segment)
+                except ValueError:
+                    continue
+            elif segment:
+                value = segment
+            else:
+                continue
+            values.append(value)
+            found = self._walk(child, segments, i + 1, values, visit)
+            if found is not None:
+                return found
+            values.pop()
+        return None
+
+    def _visit(self, path, visit):
+        leaf = self.static.get(path)
+        if leaf is not None:
+            found = visit(leaf, [])
+            if found is not None:
+                return found
+        if len(path) > 0 and path[0] == '/':
+            found = self._walk(self.root, path[1:].split('/'), 0, [], visit)
+            if found is not None:
+                return found
+        for route_methods, route_pattern, route_handler in self.regex_routes:
+            args = route_pattern.match(path)
+            if args is not None:
+                names = list(args.keys())
+                found = visit({method: (route_handler, names,
+                                        route_pattern.url_pattern)
+                               for method in route_methods},
+                              [args[name] for name in names])
+                if found is not None:
+                    return found
+        return None
+
+    def match(self, method, path):
+        """Return a ``(handler, args)`` tuple for the given method and path.
+        If the path matches only routes for other methods, ``(405, None)`` is
+        returned, and if it matches no route at all, ``(404, None)``."""
+        return self.match_route(method, path)[:2]
+
+    def match_route(self, method, path):
+        """Like :func:`match`, with the URL pattern of the matched route
+        added as a third element, or ``None`` if no route matched."""
+        status = [404]
+
+        def visit(leaf, values):
+            if method not in leaf:
+                status[0] = 405
+                return None
+            handler, names, route = leaf[method]
+            return handler, dict(zip(names, values)), route
+
+        return self._visit(path, visit) or (status[0], None, None)
+
+    def methods(self, path):
+        """Return the list of methods that have a route for the given path."""
+        allow = []
+
+        def visit(leaf, values):
+            for method in leaf:
+                if method not in allow:
+                    allow.append(method)
+            return None
+
+        self._visit(path, visit)
+        return allow
+
+
 class HTTPException(Exception):
     def __init__(self, status_code, reason=None):
         self.status_code = status_code
@@ -912,8 +1084,26 @@ class Microdot:
         app = Microdot()
     """
 
+    #: Specify how many seconds an idle persistent connection is kept open
+    #: while waiting for the next request.
+    #:
+    #: Example::
+    #:
+    #:    Microdot.keep_alive_timeout = 10
+    keep_alive_timeout = 5
+
+    #: Specify the maximum number of requests served on one persistent
+    #: connection before it is closed.
+    max_keep_alive_requests = 100
+
+    #: Specify the maximum number of connections that are kept open between
+    #: requests. Connections above this number are closed after one request,
+    #: so that idle clients cannot exhaust the sockets of the device.
+    max_keep_alive_connections = 4
+
     def __init__(self):
         self.url_map = []
+        self.routes = RouteTable()
         self.before_request_handlers = []
         self.after_request_handlers = []
         self.after_error_request_handlers = []
@@ -922,6 +1112,12 @@ class Microdot:
         self.options_handler = self.default_options_handler
         self.debug = False
         self.server = None
+        self.connections = 0
+        #: An optional object that measures requests. Its ``start()`` method
+        #: is called before a request is dispatched, and
+        #: ``record(req, res, start, written)`` once the response, of
+        #: ``written`` bytes, was sent.
+        self.metrics = None
 
     def route(self, url_pattern, methods=None):
         """Decorator that is used to register a function as a request handler
@@ -954,12 +1150,15 @@ class Microdot:
                 return 'Hello, world!'
         """
         def decorated(f):
-            self.url_map.append(
-                ([m.upper() for m in (methods or ['GET'])],
-                 URLPattern(url_pattern), f))
+            self._add_route([m.upper() for m in (methods or ['GET'])],
+                            URLPattern(url_pattern), f)
             return f
         return decorated
 
+    def _add_route(self, methods, pattern, handler):
+        self.url_map.append((methods, pattern, handler))
+        self.routes.add(methods, pattern, handler)
+
     def get(self, url_pattern):
         """Decorator that is used to register a function as a ``GET`` request
         handler for a given URL.
@@ -1131,9 +1330,9 @@ class Microdot:
         :param url_prefix: The URL prefix to mount the application under.
         """
         for methods, pattern, handler in subapp.url_map:
-            self.url_map.append(
-                (methods, URLPattern(url_prefix + pattern.url_pattern),
-                 handler))
+            self._add_route(methods,
+                            URLPattern(url_prefix + pattern.url_pattern),
+                            handler)
         for handler in subapp.before_request_handlers:
             self.before_request_handlers.append(handler)
         for handler in subapp.after_request_handlers:
@@ -1302,49 +1501,91 @@ class Microdot:
             return self.options_handler(req)
         if method == 'HEAD':
             method = 'GET'
-        f = 404
-        for route_methods, route_pattern, route_handler in self.url_map:
-            req.url_args = route_pattern.match(req.path)
-            if req.url_args is not None:
-                if method in route_methods:
-                    f = route_handler
-                    break
-                else:
-                    f = 405
+        f, req.url_args, req.route = self.routes.match_route(method, req.path)
         return f
 
     def default_options_handler(self, req):
-        allow = []
-        for route_methods, route_pattern, route_handler in self.url_map:
-            if route_pattern.match(req.path) is not None:
-                allow.extend(route_methods)
+        allow = self.routes.methods(req.path)
         if 'GET' in allow:
             allow.append('HEAD')
         allow.append('OPTIONS')
         return {'Allow': ', '.join(allow)}
 
     async def handle_request(self, reader, writer):
-        req = None
+        self.connections += 1
         try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
-
-        res = await self.dispatch_request(req)
-        if res != Response.already_handled:  # pragma: no branch
-            await res.write(writer)
-        try:
-            await writer.aclose()
-        except OSError as exc:  # pragma: no cover
-            if exc.errno in MUTED_SOCKET_ERRORS:
-                pass
-            else:
-                raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
+            requests = 0
+            while True:
+                requests += 1
+                req = None
+                try:
+                    if requests == 1:
+                        req = await Request.create(
+                            self, reader, writer,
+                            writer.get_extra_info('peername'))
+                    else:
+                        req = await asyncio.wait_for(Request.create(
+                            self, reader, writer,
+                            writer.get_extra_info('peername')),
+                            self.keep_alive_timeout)
+                        if req is None:
+                            break  # the client closed the connection
+                except asyncio.TimeoutError:
+                    break
+                except Exception as exc:  # pragma: no cover
+                    if requests > 1:
+                        break
+                    print_exception(exc)
+
+                keep_alive = self.keep_alive(req, requests)
+                if self.metrics is not None:
+                    start = self.metrics.start()
+                res = await self.dispatch_request(req)
+                if res == Response.already_handled:
+                    # the handler took over the connection (e.g. a
+                    # WebSocket), there is no response to measure
+                    keep_alive = False
+                else:
+                    if 'Content-Length' not in res.headers and \
+                            not isinstance(res.body, bytes):
+                        # streamed bodies are delimited by closing the socket
+                        keep_alive = False
+                    res.headers['Connection'] = \
+                        'keep-alive' if keep_alive else 'close'
+                    written = await res.write(writer)
+                    if self.metrics is not None:
+                        self.metrics.record(req, res, start, written)
+                if self.debug and req:  # pragma: no cover
+                    print('{method} {path} {status_code}'.format(
+                        method=req.method, path=req.path,
+                        status_code=res.status_code))
+                if not keep_alive:
+                    break
+        finally:
+            self.connections -= 1
+            try:
+                await writer.aclose()
+            except OSError as exc:  # pragma: no cover
+                if exc.errno in MUTED_SOCKET_ERRORS:
+                    pass
+                else:
+                    raise
+
+    def keep_alive(self, req, requests):
+        """Return ``True`` if the connection that carried the given request
+        can be reused for another request."""
+        if req is None or requests >= self.max_keep_alive_requests or \
+                self.connections > self.max_keep_alive_connections:
+            return False
+        if req._stream is not None and req.content_length:
+            # the body was not read into memory and may be left unread
+            return False
+        connection = req.headers.get('Connection', '').lower()
+        if connection == 'close':
+            return False
+        if connection == 'keep-alive':
+            return True
+        return req.http_version == '1.1'
 
     async def dispatch_request(self, req):
         after_request_handled = False
@@ -0,0 +1,110 @@
+import os
+import random
+import tempfile
+from array import array
+
+from utils.allowlist import AllowList, FlashAllowList, save
+
+
+def test_membership():
+    tags = random.sample(range(1 << 32), 5000)
+    allowlist = AllowList(tags + tags[:100])
+
+    assert len(allowlist) == 5000
+    assert all(tag in allowlist for tag in tags)
+
+    known = set(tags)
+    others = [tag for tag in random.sample(range(1 << 32), 1000) if tag not in known]
+    assert not any(tag in allowlist for tag in others)
+
+
+def test_delta_update():
+    allowlist = AllowList([10, 30, 50])
+    allowlist.update(add=[40, 20, 30, 60], remove=[50, 60, 70])
+
+    assert list(allowlist.tags) == [10, 20, 30, 40]
+    assert 50 not in allowlist
+    assert 60 not in allowlist
+
+
+def test_replace():
+    allowlist = AllowList([1, 2, 3])
+    allowlist.replace([6364376])
+
+    assert list(allowlist.tags) == [6364376]
+    assert 1 not in allowlist
+
+
+def test_flash_lookup():
+    path = os.path.join(tempfile.mkdtemp(), "allowlist.bin")
+    tags = random.sample(range(1 << 32), 1000)
+    # 1000 tags over pages of 64 leave a partial last page
+    save(path, tags)
+
+    allowlist = FlashAllowList(path)
+    assert len(allowlist) == 1000
+    assert len(allowlist.index) == 16
+    assert all(tag in allowlist for tag in tags)
+    assert list(allowlist) == sorted(tags)
+
+    known = set(tags)
+    others = [tag for tag in random.sample(range(1 << 32), 1000) if tag not in known]
+    assert not any(tag in allowlist for tag in others)
+    allowlist.close()
+
+
+def test_flash_update():
+    path = os.path.join(tempfile.mkdtemp(), "allowlist.bin")
+    allowlist = FlashAllowList(path, page_tags=2)
+    assert len(allowlist) == 0
+    assert 10 not in allowlist
+
+    allowlist.replace([50, 10, 30])
+    allowlist.update(add=[40, 20, 30, 60], remove=[50, 60, 70])
+
+    assert list(allowlist) == [10, 20, 30, 40]
+    assert 50 not in allowlist
+    assert list(FlashAllowList(path)) == [10, 20, 30, 40]
+    allowlist.close()
+
+
+def test_failed_replace_keeps_list():
+    path = os.path.join(tempfile.mkdtemp(), "allowlist.bin")
+    allowlist = FlashAllowList(path)
+    allowlist.replace([10, 20])
+
+    # the new list cannot be written
+    os.mkdir(path + ".tmp")
+    try:
+        allowlist.replace([30])
+    except OSError:
+        pass
+    else:
+        raise AssertionError("replace() did not fail")
+
+    assert list(allowlist) == [10, 20]
+    assert list(FlashAllowList(path)) == [10, 20]
+    allowlist.close()
+
+
+def test_rejects_zero_page_size():
+    path = os.path.join(tempfile.mkdtemp(), "allowlist.bin")
+    with open(path, "wb") as file:
+        file.write(b"RFAL" + array("I", (1, 0, 0)).tobytes() + bytes(8))
+
+    try:
+        FlashAllowList(path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a page size of 0 was accepted")
+
+
+if __name__ == "__main__":
+    test_membership()
+    test_delta_update()
+    test_replace()
+    test_flash_lookup()
+    test_flash_update()
+    test_failed_replace_keeps_list()
+    test_rejects_zero_page_size()
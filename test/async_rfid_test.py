@@ -0,0 +1,238 @@
+import asyncio
+
+from utils.rfid import (
+    DROP_CHECKSUM,
+    DROP_HEX,
+    DROP_LENGTH,
+    DROP_STOP,
+    AsyncRFIDReader,
+    CancelToken,
+    TagDebouncer,
+)
+from utils.ticks import ticks_add, ticks_diff, ticks_ms
+
+# 0x02, "0A00611CD8", checksum "AF", 0x03 -> chip id 6364376
+FRAME = b"\x020A00611CD8AF\x03"
+CHIP_ID = "6364376"
+OTHER_FRAME = b"\x020A00611CD9AE\x03"
+OTHER_CHIP_ID = "6364377"
+
+
+def make_reader():
+    stream = asyncio.StreamReader()
+    return stream, AsyncRFIDReader(stream=stream)
+
+
+def test_single_read():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME)
+        return await reader.read_single_chip(timeout_ms=1000)
+
+    chip_id = asyncio.run(run())
+    assert chip_id == CHIP_ID
+
+
+def test_split_and_merged_frames():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME[:5])
+        stream.feed_data(FRAME[5:] + b"\x02" + FRAME)
+        first = await reader.next_tag()
+        second = await reader.next_tag()
+        return first, second, reader.decoder.resyncs
+
+    first, second, resyncs = asyncio.run(run())
+    assert first == second == int(CHIP_ID)
+    assert resyncs == 1
+
+
+def test_read_drops_stale_tags():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME + OTHER_FRAME)
+        first = await reader.read_single_chip(timeout_ms=1000)
+        # OTHER_FRAME was decoded with the first one, before this read started
+        second = await reader.read_single_chip(timeout_ms=100)
+        return first, second
+
+    assert asyncio.run(run()) == (CHIP_ID, None)
+
+
+def test_pending_read_yields_to_loop():
+    async def run():
+        stream, reader = make_reader()
+        ticks = 0
+
+        async def other_client():
+            nonlocal ticks
+            for _ in range(10):
+                ticks += 1
+                await asyncio.sleep(0.01)
+            stream.feed_data(FRAME)
+
+        task = asyncio.create_task(other_client())
+        chip_id = await reader.read_single_chip(timeout_ms=1000)
+        await task
+        return chip_id, ticks
+
+    chip_id, ticks = asyncio.run(run())
+    assert chip_id == CHIP_ID
+    assert ticks == 10
+
+
+def test_timeout():
+    async def run():
+        stream, reader = make_reader()
+        return await reader.detect_chip_with_id(CHIP_ID, timeout_ms=50)
+
+    assert asyncio.run(run()) is None
+
+
+def test_cancelled_read():
+    async def run():
+        stream, reader = make_reader()
+        task = asyncio.create_task(reader.read_single_chip())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        # the reader is still usable after a cancelled read
+        stream.feed_data(FRAME)
+        return task.cancelled(), await reader.read_single_chip(timeout_ms=1000)
+
+    cancelled, chip_id = asyncio.run(run())
+    assert cancelled
+    assert chip_id == CHIP_ID
+
+
+def test_continuous_read():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME)
+        stream.feed_data(FRAME)
+        return [
+            chip_id async for chip_id in reader.read_continuously(timeout_ms=100)
+        ]
+
+    chip_ids = asyncio.run(run())
+    assert chip_ids == [CHIP_ID]
+
+
+def test_second_tag_within_window():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME + FRAME + OTHER_FRAME + FRAME + OTHER_FRAME)
+        return [
+            chip_id async for chip_id in reader.read_continuously(timeout_ms=100)
+        ]
+
+    chip_ids = asyncio.run(run())
+    assert chip_ids == [CHIP_ID, OTHER_CHIP_ID]
+
+
+def test_continuous_read_stops_on_token():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME)
+        shouldStop = CancelToken()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        chip_ids = []
+        # same arguments as RFIDReader.read_continuously()
+        async for chip_id in reader.read_continuously(shouldStop, 5000):
+            chip_ids.append(chip_id)
+            loop.call_later(0.05, shouldStop.cancel)
+        return chip_ids, loop.time() - start
+
+    chip_ids, elapsed = asyncio.run(run())
+    assert chip_ids == [CHIP_ID]
+    assert elapsed < 1
+
+
+def test_collect_limits_distinct_tags():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(FRAME + OTHER_FRAME + FRAME)
+        return await reader.collect(50, max_tags=1)
+
+    results = asyncio.run(run())
+    assert [(tag, hits) for tag, first_seen, hits in results] == [(int(CHIP_ID), 2)]
+
+
+def test_debouncer_window_and_eviction():
+    debouncer = TagDebouncer(window_ms=1000, capacity=2)
+    assert debouncer.check(1, now=0)
+    # a repeat is suppressed while it keeps arriving within the window
+    assert not debouncer.check(1, now=900)
+    assert not debouncer.check(1, now=1800)
+    assert debouncer.check(1, now=3000)
+
+    assert debouncer.check(2, now=3100)
+    assert not debouncer.check(1, now=3200)
+    # the table is full, tag 2 was seen least recently and gets evicted
+    assert debouncer.check(3, now=3300)
+    assert debouncer.check(2, now=3400)
+    assert not debouncer.check(3, now=3500)
+
+
+def test_debouncer_across_tick_wrap():
+    # host ticks wrap at 2**30 like the board's, so they fit the tables
+    assert 0 <= ticks_ms() < 1 << 30
+    last = ticks_add(0, -100)
+    debouncer = TagDebouncer(window_ms=1000)
+    assert debouncer.check(1, now=last)
+    assert not debouncer.check(1, now=ticks_add(last, 900))
+    assert ticks_diff(ticks_add(last, 900), last) == 900
+    assert debouncer.check(1, now=ticks_add(last, 2000))
+
+
+def test_reader_stats():
+    async def run():
+        stream, reader = make_reader()
+        stream.feed_data(
+            b"noise"
+            + FRAME[:5]  # cut short by the next header
+            + FRAME[:-1]
+            + b"X"  # no stop byte
+            + b"\x020A00611CD8AE\x03"  # bad checksum
+            + b"\x020A00611CDGAF\x03"  # not hex
+            + FRAME
+            + FRAME
+        )
+        chip_ids = [
+            chip_id async for chip_id in reader.read_continuously(timeout_ms=100)
+        ]
+        return chip_ids, reader
+
+    chip_ids, reader = asyncio.run(run())
+    stats = reader.stats
+    assert chip_ids == [CHIP_ID]
+    assert stats.frames == 2
+    assert stats.skipped == 5
+    assert stats.resyncs == 2
+    assert stats.bytes == 5 + 5 + 14 * 5
+    assert stats.drops[DROP_LENGTH] == stats.drops[DROP_STOP] == 1
+    assert stats.drops[DROP_CHECKSUM] == stats.drops[DROP_HEX] == 1
+    assert reader.debouncer.suppressed == 1
+    latency = stats.as_dict()["latency_us"]
+    assert 0 <= latency["last"] <= latency["max"]
+
+
+if __name__ == "__main__":
+    test_single_read()
+    test_split_and_merged_frames()
+    test_read_drops_stale_tags()
+    test_pending_read_yields_to_loop()
+    test_timeout()
+    test_cancelled_read()
+    test_continuous_read()
+    test_second_tag_within_window()
+    test_continuous_read_stops_on_token()
+    test_collect_limits_distinct_tags()
+    test_debouncer_window_and_eviction()
+    test_debouncer_across_tick_wrap()
+    test_reader_stats()
@@ -0,0 +1,57 @@
+# pytest runs the tests on the host, with host/ standing in for machine, utime
+# and the other MicroPython modules. led_test.py and rfid_test.py are manual
+# scripts for the board (or host/run.py) and are not collected.
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "host"))
+
+collect_ignore = ["led_test.py", "rfid_test.py"]
+
+
+class AppServer:
+    # Serves a Microdot app on a free local port for the length of an
+    # "async with" block
+    def __init__(self, app):
+        self.app = app
+        self.task = None
+        self.port = None
+
+    async def __aenter__(self):
+        app = self.app
+        self.task = asyncio.create_task(app.start_server(host="127.0.0.1", port=0))
+        while app.server is None or not app.server.sockets:
+            await asyncio.sleep(0.01)
+        self.port = app.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.app.shutdown()
+        await self.task
+
+    def connect(self):
+        return asyncio.open_connection("127.0.0.1", self.port)
+
+
+async def fetch(app, data, timeout_s=2):
+    # Sends raw request bytes on one connection and returns everything the
+    # app answers until it closes the connection
+    async with AppServer(app) as server:
+        reader, writer = await server.connect()
+        writer.write(data)
+        response = await asyncio.wait_for(reader.read(), timeout_s)
+        writer.close()
+    return response
+
+
+@pytest.fixture(name="app_server")
+def app_server_fixture():
+    return AppServer
+
+
+@pytest.fixture(name="fetch")
+def fetch_fixture():
+    return fetch
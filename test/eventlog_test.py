@@ -0,0 +1,42 @@
+from utils.eventlog import MODE_BATCH, MODE_READ, EventLog, mode_names
+
+
+def test_pages_by_sequence():
+    log = EventLog(size=8)
+    for tag in range(1, 21):
+        log.append(tag, tag * 10, mode=MODE_READ)
+
+    # only the last 8 events are left, seq 13 to 20
+    assert log.first_seq() == 13
+    page = log.since(0, 5)
+    assert [event[0] for event in page] == [13, 14, 15, 16, 17]
+    page = log.since(page[-1][0], 5)
+    assert [event[0] for event in page] == [18, 19, 20]
+    assert log.since(20, 5) == []
+    assert page[-1] == (20, 20, 200, None, MODE_READ)
+
+
+def test_allowed_and_modes():
+    log = EventLog(size=4)
+    log.append(1, 0, allowed=True, mode=MODE_READ | MODE_BATCH)
+    log.append(2, 0, allowed=False)
+
+    first, second = log.since(0, 10)
+    assert first[3] is True and second[3] is False
+    assert mode_names(first[4]) == ["read", "batch"]
+    assert mode_names(second[4]) == []
+
+
+def test_restarted_sequence():
+    log = EventLog(size=4)
+    log.append(1, 0)
+    log.append(2, 0)
+
+    # a client that saw seq 50 before a reboot starts over
+    assert [event[0] for event in log.since(50, 10)] == [1, 2]
+
+
+if __name__ == "__main__":
+    test_pages_by_sequence()
+    test_allowed_and_modes()
+    test_restarted_sequence()
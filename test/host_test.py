@@ -0,0 +1,62 @@
+import threading
+
+import machine
+import utime
+from host.rdm6300 import RDM6300, make_frame
+from utils.rfid import DROP_CHECKSUM, RFIDReader
+
+# 0x02, "0A00611CD8", checksum "AF", 0x03 -> chip id 6364376
+FRAME = b"\x020A00611CD8AF\x03"
+CHIP_ID = 6364376
+
+
+def test_make_frame():
+    assert make_frame(CHIP_ID) == FRAME
+    assert make_frame(CHIP_ID, bad_checksum=True) != FRAME
+
+
+def test_simulated_module_on_uart():
+    # The reader as the firmware builds it, on the UART(0) stand-in. The
+    # module sends from this thread, so the RX idle handler has drained each
+    # frame by the time send() returns.
+    reader = RFIDReader(gpioPin=1)
+    tags = []
+
+    module = RDM6300(
+        machine.wire(0),
+        tags=(CHIP_ID, 1234),
+        chunk=(1, 5),
+        noise=0.3,
+        bad_checksum=0.2,
+        baudrate=None,
+        seed=6300,
+    )
+    for i in range(200):
+        module.send(module.tags[i % 2])
+        tags.extend(reader.read_tags(0))
+    reader.capture.stop()
+
+    assert module.corrupted and module.noise_bytes
+    assert len(tags) == module.frames - module.corrupted
+    assert set(tags) == {CHIP_ID, 1234}
+    assert reader.stats.drops[DROP_CHECKSUM] == module.corrupted
+
+
+def test_ticks_wrap_around():
+    assert utime.ticks_diff(utime.ticks_add(utime.TICKS_MAX, 5), utime.TICKS_MAX) == 5
+    assert utime.ticks_diff(0, utime.TICKS_MAX) == 1
+
+
+def test_one_shot_timer():
+    fired = threading.Event()
+    timer = machine.Timer()
+    timer.init(period=10, mode=machine.Timer.ONE_SHOT, callback=lambda t: fired.set())
+    assert fired.wait(1)
+    timer.deinit()
+
+
+if __name__ == "__main__":
+    test_make_frame()
+    test_simulated_module_on_uart()
+    test_ticks_wrap_around()
+    test_one_shot_timer()
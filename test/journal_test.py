@@ -0,0 +1,98 @@
+import os
+import tempfile
+from array import array
+
+from utils.journal import HEADER_SIZE, RECORD_SIZE, Journal, JournalExport
+
+
+def make_journal(**kwargs):
+    return Journal(os.path.join(tempfile.mkdtemp(), "journal.bin"), **kwargs)
+
+
+def event(seq, tag=6364376, allowed=None, mode=1):
+    return (seq, tag, 0, allowed, mode)
+
+
+def test_writes_full_blocks():
+    journal = make_journal(block_records=4)
+    for seq in range(1, 4):
+        journal.append(event(seq))
+    assert not os.path.exists(journal.path)
+
+    journal.append(event(4, allowed=True))
+    assert os.path.getsize(journal.path) == HEADER_SIZE + 4 * RECORD_SIZE
+
+    with open(journal.path, "rb") as file:
+        data = file.read()
+    records = array("I", data[HEADER_SIZE:])
+    assert data[:4] == b"RFJ1"
+    assert list(records[0::4]) == [1, 2, 3, 4]
+    assert records[14] == 6364376
+    assert records[15] == 1 | 1 << 8
+
+
+def test_rotates_by_size():
+    journal = make_journal(max_size=HEADER_SIZE + 4 * RECORD_SIZE, block_records=2)
+    for seq in range(1, 7):
+        journal.append(event(seq))
+
+    assert os.path.getsize(journal.path + ".1") == HEADER_SIZE + 4 * RECORD_SIZE
+    assert os.path.getsize(journal.path) == HEADER_SIZE + 2 * RECORD_SIZE
+
+
+def test_export_joins_rotated_and_current():
+    journal = make_journal(max_size=HEADER_SIZE + 4 * RECORD_SIZE, block_records=2)
+    for seq in range(1, 8):
+        journal.append(event(seq))
+
+    export = JournalExport(journal)
+    chunks = []
+    while True:
+        chunk = export.read(40)
+        chunks.append(chunk)
+        if len(chunk) < 40:
+            break
+    export.close()
+
+    data = b"".join(chunks)
+    assert len(data) == export.length == HEADER_SIZE + 7 * RECORD_SIZE
+    assert list(array("I", data[HEADER_SIZE:])[0::4]) == list(range(1, 8))
+    assert journal.exports == 0
+
+
+def test_counts_failed_writes():
+    # the directory does not exist yet, so every write fails
+    directory = os.path.join(tempfile.mkdtemp(), "missing")
+    journal = Journal(os.path.join(directory, "journal.bin"), block_records=2)
+    for seq in range(1, 5):
+        journal.append(event(seq))
+    assert journal.errors == 3
+    assert journal.dropped == 2
+
+    # the kept block is written once the flash is back
+    os.mkdir(directory)
+    journal.append(event(5))
+    journal.flush()
+    with open(journal.path, "rb") as file:
+        records = array("I", file.read()[HEADER_SIZE:])
+    assert list(records[0::4]) == [1, 2, 5]
+
+
+def test_export_counts_failed_flush():
+    directory = os.path.join(tempfile.mkdtemp(), "missing")
+    journal = Journal(os.path.join(directory, "journal.bin"))
+    journal.append(event(1))
+
+    export = JournalExport(journal)
+    data = export.read()
+    export.close()
+    assert data[:4] == b"RFJ1" and len(data) == export.length == HEADER_SIZE
+    assert journal.errors == 1 and journal.pending == 1
+
+
+if __name__ == "__main__":
+    test_writes_full_blocks()
+    test_rotates_by_size()
+    test_export_joins_rotated_and_current()
+    test_counts_failed_writes()
+    test_export_counts_failed_flush()
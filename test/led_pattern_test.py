@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.led import (
+    BITSTREAMS,
+    LED,
+    MAX_PATTERNS,
+    PATTERNS,
+    LEDScheduler,
+    compile_bitstream,
+    compile_pattern,
+)
+
+
+def test_compile_bitstream():
+    # "+-+---" does not tile 32 bits, so it is only played by PIO a set number
+    # of times, followed by an all-off word
+    steps = compile_pattern("+-+---")
+    assert compile_bitstream(steps, -1) is None
+    assert list(compile_bitstream(steps, 2)) == [0b000101000101, 0]
+    assert list(compile_bitstream(compile_pattern("+-"), -1)) == [0x55555555]
+    # hold steps depend on the state before them and stay in software
+    assert compile_bitstream(compile_pattern("+.-"), 1) is None
+    # too long to fit is known before the steps are repeated, and not cached
+    assert compile_bitstream(compile_pattern("+-"), 10**9) is None
+    assert (compile_pattern("+-"), 10**9) not in BITSTREAMS
+
+
+def test_pattern_cache_is_bounded():
+    for i in range(3 * MAX_PATTERNS):
+        assert compile_pattern("+" * i + "-") == bytes([1] * i + [0])
+    assert len(PATTERNS) <= MAX_PATTERNS
+
+
+def test_step_time_must_be_positive():
+    async def run():
+        led = LED(3, scheduler=LEDScheduler())
+        try:
+            led.blink("+-", 0, continuous=True)
+        except ValueError:
+            rejected = True
+        else:
+            rejected = False
+
+        # a zero timeout still ends, after one step
+        led.on(timeout_ms=0)
+        await asyncio.sleep(0.1)
+        return rejected, led
+
+    rejected, led = asyncio.run(run())
+    assert rejected
+    assert not led.is_on() and not led.is_blinking()
+
+
+if __name__ == "__main__":
+    test_compile_bitstream()
+    test_pattern_cache_is_bounded()
+    test_step_time_must_be_positive()
@@ -0,0 +1,88 @@
+import asyncio
+import io
+
+from utils.logger import LINE_SIZE, Logger, LogRing, StreamSink
+
+
+class Explodes:
+    def __format__(self, spec):
+        raise AssertionError("argument of a disabled message was formatted")
+
+
+def test_disabled_levels_are_not_formatted():
+    stream = io.BytesIO()
+    logger = Logger("INFO", stream)
+    logger.debug("Read returned with data {}", Explodes())
+    logger.disable_level("WARNING")
+    logger.warning("Disabled {}", Explodes())
+    assert stream.getvalue() == b""
+
+
+def test_format_and_truncate():
+    stream = io.BytesIO()
+    logger = Logger("DEBUG", stream)
+    logger.debug("Using timeout set to {}", 30)
+    logger.error("x" * 1000)
+
+    first, second = stream.getvalue().splitlines(keepends=True)
+    assert first.endswith(b"] [DEBUG] Using timeout set to 30\n")
+    assert len(second) == LINE_SIZE and second.endswith(b"x\n")
+
+
+def test_truncate_keeps_utf8_whole():
+    stream = io.BytesIO()
+    logger = Logger("DEBUG", stream)
+    for prefix in ("", "x", "xx"):
+        logger.error(prefix + "\u00e9\u20ac" * 200)
+
+    for line in stream.getvalue().splitlines(keepends=True):
+        assert len(line) <= LINE_SIZE
+        assert line.decode().rstrip().endswith(("\u00e9", "\u20ac"))
+
+
+def test_ring_keeps_recent_lines():
+    ring = LogRing(size=64, records=4)
+    for i in range(10):
+        ring.append(b"line %d\n" % i)
+
+    lines = ring.since(0, 10)
+    assert [seq for seq, line in lines] == [7, 8, 9, 10]
+    assert lines[-1][1] == b"line 9\n"
+    assert ring.since(8, 1) == [(9, b"line 8\n")]
+
+    # long lines wrap around the end of the buffer and push out old ones
+    ring.append(b"x" * 50 + b"\n")
+    assert ring.floor == 10
+    assert ring.since(0, 10) == [(10, b"line 9\n"), (11, b"x" * 50 + b"\n")]
+
+
+def test_sinks_get_batches():
+    async def run():
+        stream = io.BytesIO()
+        ring = LogRing(size=128, records=8)
+        ring.sinks.append(StreamSink(stream))
+        logger = Logger("INFO", ring=ring)
+
+        logger.info("first")
+        logger.info("second {}", 2)
+        assert stream.getvalue() == b""
+        await ring.flush()
+        batch = stream.getvalue()
+
+        for i in range(10):
+            ring.append(b"%d\n" % i)
+        await ring.flush()
+        return batch, stream.getvalue()[len(batch) :], ring.dropped
+
+    batch, rest, dropped = asyncio.run(run())
+    assert batch.endswith(b"] [INFO] second 2\n") and batch.count(b"\n") == 2
+    assert rest == b"2\n3\n4\n5\n6\n7\n8\n9\n"
+    assert dropped == 2
+
+
+if __name__ == "__main__":
+    test_disabled_levels_are_not_formatted()
+    test_format_and_truncate()
+    test_truncate_keeps_utf8_whole()
+    test_ring_keeps_recent_lines()
+    test_sinks_get_batches()
@@ -0,0 +1,102 @@
+import asyncio
+
+from microdot import Microdot, Response
+from utils.metrics import BUCKET_LABELS, Metrics
+
+app = Microdot()
+app.metrics = Metrics(max_routes=3)
+
+
+@app.route("/users/<int:id>")
+async def user(req, id):
+    return {"id": id}
+
+
+@app.route("/fail")
+async def fail(req):
+    return "no", 500
+
+
+@app.route("/other")
+async def other(req):
+    return "other"
+
+
+def request(path, close=False):
+    return "GET {} HTTP/1.1\r\nHost: x\r\n{}\r\n".format(
+        path, "Connection: close\r\n" if close else ""
+    ).encode()
+
+
+def test_requests_are_counted_per_route(fetch):
+    data = asyncio.run(
+        fetch(
+            app,
+            request("/users/1")
+            + request("/users/2")
+            + request("/fail")
+            + request("/missing")
+            + request("/other", close=True)
+        )
+    )
+    metrics = app.metrics
+    text = b"".join(metrics.export()).decode()
+
+    route = 'method="GET",route="/users/<int:id>"'
+    assert 'http_requests_total{{{},status="2xx"}} 2\n'.format(route) in text
+    assert (
+        'http_request_duration_seconds_bucket{{{},le="+Inf"}} 2\n'.format(route)
+        in text
+    )
+    assert 'http_requests_total{method="GET",route="/fail",status="5xx"} 1' in text
+    # unmatched paths and routes past max_routes share slot 0
+    unmatched = 'method="",route="unmatched"'
+    assert 'http_requests_total{{{},status="4xx"}} 1\n'.format(unmatched) in text
+    assert 'http_requests_total{{{},status="2xx"}} 1\n'.format(unmatched) in text
+    assert "/other" not in text
+
+    assert sum(metrics.written[:3]) == len(data)
+    assert text.index("# TYPE http_requests_total counter") < text.index(
+        "# TYPE http_request_duration_seconds histogram"
+    )
+
+
+def test_latency_buckets():
+    class Req:
+        method = "GET"
+        route = "/"
+
+    metrics = Metrics()
+    start = metrics.start()
+    metrics.record(Req(), Response(), start - 3000, 10)
+    metrics.record(Req(), Response(), start - 10000000, 10)
+
+    buckets = metrics.buckets[len(BUCKET_LABELS) : 2 * len(BUCKET_LABELS)]
+    assert buckets[2] == 1  # 3 ms falls in le="0.005000"
+    assert buckets[-1] == 1  # 10 s is above every bound
+    assert metrics.written[1] == 20
+    assert metrics.latency_us[1] >= 10003000
+
+
+def test_export_is_chunked():
+    class Req:
+        method = "GET"
+
+    metrics = Metrics()
+    for i in range(10):
+        req = Req()
+        req.route = "/route/{}".format(i)
+        metrics.record(req, Response(), metrics.start(), 100)
+
+    chunks = list(metrics.export())
+    assert len(chunks) > 1
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b"".join(chunks).count(b"http_response_bytes_total{") == 10
+
+
+if __name__ == "__main__":
+    from conftest import fetch
+
+    test_requests_are_counted_per_route(fetch)
+    test_latency_buckets()
+    test_export_is_chunked()
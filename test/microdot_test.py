@@ -0,0 +1,117 @@
+import asyncio
+
+from microdot import Microdot, Response
+
+app = Microdot()
+
+
+@app.route("/stream")
+async def stream(req):
+    def body():
+        yield "one"
+        yield "two"
+
+    return body()
+
+
+@app.route("/")
+@app.route("/<name>")
+async def index(req, name=None):
+    return {"path": req.path}
+
+
+def request(path, version="1.1", headers=b""):
+    return "GET {} HTTP/{}\r\nHost: x\r\n".format(path, version).encode() + headers
+
+
+def test_pipelined_requests_share_connection(fetch):
+    data = asyncio.run(
+        fetch(
+            app,
+            request("/a") + b"\r\n"
+            + request("/b") + b"\r\n"
+            + request("/c", headers=b"Connection: close\r\n") + b"\r\n"
+        )
+    )
+    assert data.count(b"HTTP/1.1 200 OK") == 3
+    assert data.count(b"Connection: keep-alive") == 2
+    assert data.count(b"Connection: close") == 1
+    assert data.index(b'"/a"') < data.index(b'"/b"') < data.index(b'"/c"')
+
+
+def test_http10_closes_without_keep_alive(fetch):
+    data = asyncio.run(fetch(app, request("/", version="1.0") + b"\r\n"))
+    assert data.count(b"HTTP/1.1 200 OK") == 1
+    assert b"Connection: close" in data
+
+
+def test_streamed_body_closes_connection(fetch):
+    data = asyncio.run(
+        fetch(app, request("/stream") + b"\r\n" + request("/") + b"\r\n")
+    )
+    assert data.count(b"HTTP/1.1 200 OK") == 1
+    assert data.endswith(b"onetwo")
+
+
+def test_max_requests_per_connection(fetch):
+    Microdot.max_keep_alive_requests = 2
+    try:
+        data = asyncio.run(fetch(app, (request("/") + b"\r\n") * 3))
+    finally:
+        Microdot.max_keep_alive_requests = 100
+    assert data.count(b"HTTP/1.1 200 OK") == 2
+    assert data.count(b"Connection: close") == 1
+
+
+def test_small_response_is_one_write():
+    class Stream:
+        def __init__(self):
+            self.writes = []
+
+        async def awrite(self, data):
+            self.writes.append(bytes(data))
+
+    small, large = Stream(), Stream()
+    asyncio.run(Response({"id": "6364376"}).write(small))
+    asyncio.run(Response("x" * (Response.coalesce_body_length + 1)).write(large))
+
+    assert len(small.writes) == 1
+    assert small.writes[0].startswith(b"HTTP/1.1 200 OK\r\n")
+    assert small.writes[0].endswith(b'\r\n\r\n{"id": "6364376"}')
+    assert len(large.writes) == 2
+
+
+def test_route_table_lookup():
+    class Req:
+        def __init__(self, method, path):
+            self.method = method
+            self.path = path
+
+    routes = Microdot()
+    user = routes.route("/users/<int:id>")(lambda req, id: None)
+    me = routes.route("/users/me", methods=["POST"])(lambda req: None)
+    files = routes.route("/files/<path:name>")(lambda req, name: None)
+
+    req = Req("GET", "/users/42")
+    assert routes.find_route(req) is user and req.url_args == {"id": 42}
+    assert req.route == "/users/<int:id>"
+    assert routes.find_route(Req("POST", "/users/me")) is me
+    assert routes.find_route(Req("GET", "/users/me")) == 405
+    assert routes.find_route(Req("GET", "/users/x/y")) == 404
+    req = Req("GET", "/files/a/b.txt")
+    assert routes.find_route(req) is files and req.url_args == {"name": "a/b.txt"}
+    assert req.route == "/files/<path:name>"
+    assert routes.find_route(Req("OPTIONS", "/users/me")) == {
+        "Allow": "POST, OPTIONS"
+    }
+
+
+if __name__ == "__main__":
+    from conftest import fetch
+
+    test_pipelined_requests_share_connection(fetch)
+    test_http10_closes_without_keep_alive(fetch)
+    test_streamed_body_closes_connection(fetch)
+    test_max_requests_per_connection(fetch)
+    test_small_response_is_one_write()
+    test_route_table_lookup()
@@ -1,6 +1,6 @@
 from machine import Timer
 
-from utils.rfid import RFIDReader
+from utils.rfid import CancelToken, RFIDReader
 
 
 def test_single_shot_run():
@@ -22,15 +22,15 @@ def test_run_indefinitely():
     print("\nTesting run indefinitely...")
     rfid_reader = RFIDReader(1, True)
 
-    shouldStop = False
+    shouldStop = CancelToken()
 
     def stopContinuousRead(timer):
-        shouldStop = True
+        shouldStop.cancel()
 
     stopTimer = Timer()
     stopTimer.init(period=10000, mode=Timer.ONE_SHOT, callback=stopContinuousRead)
 
-    for chip_id in rfid_reader.read_continuously(shouldStop, timeout_ms=2000):
+    for chip_id in rfid_reader.read_continuously(shouldStop, timeout_ms=20000):
         print("Run indefinitely result:", chip_id)
         # Add your custom handling logic here
         # break  # Uncomment to limit the indefinite run for testing purposes
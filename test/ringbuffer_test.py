@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from utils.rfid import AsyncRFIDReader, CancelToken, UARTCapture
+from utils.ringbuffer import RingBuffer
+
+FRAME = b"\x020A00611CD8AF\x03"
+
+
+class LoopbackUART:
+    # Minimal UART double: bytes written by the test are returned by readinto
+    def __init__(self):
+        self.pending = bytearray()
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        with self.lock:
+            self.pending += data
+
+    def any(self):
+        return len(self.pending)
+
+    def readinto(self, buf):
+        with self.lock:
+            n = min(len(buf), len(self.pending))
+            buf[:n] = self.pending[:n]
+            del self.pending[:n]
+        return n or None
+
+
+def test_wraparound():
+    ring = RingBuffer(8)
+    assert ring.put(b"abcde") == 5
+    assert ring.read(3) == b"abc"
+    assert ring.put(b"fghij") == 5
+    assert ring.any() == 7
+    assert ring.read() == b"defghij"
+    assert ring.any() == 0
+
+
+def test_overflow_drops_newest():
+    ring = RingBuffer(8)
+    assert ring.put(b"0123456789") == 7
+    assert ring.dropped == 3
+    assert ring.read() == b"0123456"
+
+
+def test_readinto_partial():
+    ring = RingBuffer(16)
+    ring.put(b"hello")
+    buf = bytearray(3)
+    assert ring.readinto(buf) == 3
+    assert buf == b"hel"
+    assert ring.read() == b"lo"
+
+
+def test_capture_wakes_async_reader():
+    async def run():
+        uart = LoopbackUART()
+        capture = UARTCapture(uart)
+        reader = AsyncRFIDReader(stream=capture)
+
+        async def tag_arrives():
+            await asyncio.sleep(0.05)
+            uart.write(FRAME[:6])
+            await asyncio.sleep(0.01)
+            uart.write(FRAME[6:])
+
+        task = asyncio.create_task(tag_arrives())
+        chip_id = await reader.read_single_chip(timeout_ms=1000)
+        await task
+        capture.stop()
+        return chip_id
+
+    chip_id = asyncio.run(run())
+    assert chip_id == "6364376"
+
+
+def test_cancel_stops_read_wait():
+    capture = UARTCapture(LoopbackUART())
+    cancel = CancelToken()
+    threading.Timer(0.05, cancel.cancel).start()
+
+    start = time.monotonic()
+    data = capture.read_wait(5000, cancel)
+    elapsed = time.monotonic() - start
+    capture.stop()
+
+    assert data is None
+    assert elapsed < 0.5
+
+
+if __name__ == "__main__":
+    test_wraparound()
+    test_overflow_drops_newest()
+    test_readinto_partial()
+    test_capture_wakes_async_reader()
+    test_cancel_stops_read_wait()
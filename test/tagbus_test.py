@@ -0,0 +1,203 @@
+import asyncio
+
+from utils.allowlist import AllowList
+from utils.rfid import AsyncRFIDReader
+from utils.tagbus import TagBus
+
+FRAME = b"\x020A00611CD8AF\x03"
+TAG = 6364376
+OTHER_FRAME = b"\x020A00611CD9AE\x03"
+OTHER_TAG = 6364377
+
+
+def make_bus():
+    stream = asyncio.StreamReader()
+    return stream, TagBus(AsyncRFIDReader(stream=stream))
+
+
+def test_clients_share_one_reader():
+    async def run():
+        stream, bus = make_bus()
+        waiters = [
+            asyncio.create_task(bus.wait(timeout_ms=1000)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        stream.feed_data(FRAME)
+        events = await asyncio.gather(*waiters)
+        return events, bus
+
+    events, bus = asyncio.run(run())
+    assert [event[1] for event in events] == [TAG] * 3
+    assert len({event[0] for event in events}) == 1
+    assert bus.task is None and not bus.subscribers
+
+
+def test_slow_subscriber_drops_oldest():
+    async def run():
+        stream, bus = make_bus()
+        subscription = bus.subscribe(maxsize=2)
+        for tag in (1, 2, 3):
+            bus.publish(tag)
+        events = [await subscription.get(), await subscription.get()]
+        subscription.close()
+        return events, subscription.dropped
+
+    events, dropped = asyncio.run(run())
+    assert [event[1] for event in events] == [2, 3]
+    assert dropped == 1
+
+
+def test_resume_from_last_event_id():
+    async def run():
+        stream, bus = make_bus()
+        for tag in range(1, 21):
+            bus.publish(tag)
+        subscription = bus.subscribe(last_seq=18)
+        events = [await subscription.get(), await subscription.get()]
+        subscription.close()
+        return events, bus.replay(0)
+
+    events, replayed = asyncio.run(run())
+    assert [event[0] for event in events] == [19, 20]
+    assert [event[0] for event in replayed] == list(range(5, 21))
+
+
+def test_stream_ends_after_timeout():
+    async def run():
+        stream, bus = make_bus()
+        stream.feed_data(FRAME)
+        return [event async for event in bus.subscribe(timeout_ms=100)], bus
+
+    events, bus = asyncio.run(run())
+    assert [event[1] for event in events] == [TAG]
+    assert bus.task is None
+
+
+def test_batch_collects_distinct_tags():
+    async def run():
+        stream, bus = make_bus()
+
+        async def tags_arrive():
+            await asyncio.sleep(0.01)
+            stream.feed_data(FRAME + FRAME + OTHER_FRAME + FRAME)
+
+        task = asyncio.create_task(tags_arrive())
+        collector = await bus.collect(100)
+        await task
+        return collector.results(), bus
+
+    results, bus = asyncio.run(run())
+    assert [(tag, hits) for tag, first_seen, hits in results] == [
+        (TAG, 3),
+        (OTHER_TAG, 1),
+    ]
+    assert all(0 <= first_seen < 100 for tag, first_seen, hits in results)
+    assert bus.task is None and not bus.collectors
+
+
+def test_events_carry_allowlist_decision():
+    async def run():
+        stream, bus = make_bus()
+        subscription = bus.subscribe()
+        bus.publish(TAG)
+        bus.reader.allowlist = AllowList([TAG])
+        bus.publish(TAG)
+        bus.publish(OTHER_TAG)
+        events = [await subscription.get() for _ in range(3)]
+        subscription.close()
+        return events
+
+    events = asyncio.run(run())
+    assert [event[3] for event in events] == [None, True, False]
+    # the bus stamps events with wrapping ticks that fit the event log
+    assert all(0 <= event[2] < 1 << 30 for event in events)
+
+
+def test_wait_for_tag_ignores_others():
+    async def run():
+        stream, bus = make_bus()
+        waiter = asyncio.create_task(bus.wait(tag=OTHER_TAG, timeout_ms=1000))
+        # None is not "any tag", a bad card id must never match
+        bad = asyncio.create_task(bus.wait(tag=None, timeout_ms=100))
+        await asyncio.sleep(0.01)
+        stream.feed_data(FRAME + OTHER_FRAME)
+        return await waiter, await bad
+
+    event, bad = asyncio.run(run())
+    assert event[1] == OTHER_TAG
+    assert bad is None
+
+
+def test_waiter_gets_card_already_in_field():
+    async def run():
+        stream, bus = make_bus()
+        subscription = bus.subscribe()
+        stream.feed_data(FRAME)
+        first = await subscription.get(1000)
+
+        # the card stays in the field, its repeats are debounced for the
+        # stream but a new one-shot read still gets one
+        waiter = asyncio.create_task(bus.wait(timeout_ms=1000))
+        await asyncio.sleep(0.01)
+        stream.feed_data(FRAME)
+        event = await waiter
+        repeat = await subscription.get(50)
+        subscription.close()
+        return first, event, repeat, bus
+
+    first, event, repeat, bus = asyncio.run(run())
+    assert first[1] == event[1] == TAG
+    assert event[0] == first[0] + 1
+    assert repeat is None
+    assert not bus.waiters and bus.task is None
+
+
+class FailingAllowList:
+    # Fails the first lookup like a flash read error would
+    def __init__(self):
+        self.failed = False
+
+    def __contains__(self, tag):
+        if not self.failed:
+            self.failed = True
+            raise OSError(5)
+        return True
+
+
+def test_errors_do_not_stop_the_bus():
+    async def run():
+        stream, bus = make_bus()
+        bus.reader.allowlist = FailingAllowList()
+        subscription = bus.subscribe()
+        stream.feed_data(FRAME + OTHER_FRAME)
+        event = await subscription.get(1000)
+        task = bus.task
+
+        # the reader failing ends the task, the next subscriber starts another
+        stream.feed_eof()
+        await asyncio.sleep(0.01)
+        stopped = bus.task is None
+        subscription.close()
+        stream = bus.reader.stream = asyncio.StreamReader()
+        waiter = asyncio.create_task(bus.wait(timeout_ms=1000))
+        await asyncio.sleep(0.01)
+        stream.feed_data(FRAME)
+        return event, task, stopped, await waiter, bus
+
+    event, task, stopped, restarted, bus = asyncio.run(run())
+    assert event[1] == OTHER_TAG and event[3] is True
+    assert bus.errors == 1 and "OSError" in bus.last_error
+    assert task.done() and stopped
+    assert restarted[1] == TAG
+
+
+if __name__ == "__main__":
+    test_clients_share_one_reader()
+    test_slow_subscriber_drops_oldest()
+    test_resume_from_last_event_id()
+    test_stream_ends_after_timeout()
+    test_batch_collects_distinct_tags()
+    test_events_carry_allowlist_decision()
+    test_wait_for_tag_ignores_others()
+    test_waiter_gets_card_already_in_field()
+    test_errors_do_not_stop_the_bus()
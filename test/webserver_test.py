@@ -0,0 +1,105 @@
+import asyncio
+import json
+import tempfile
+
+from host import run as host_run
+
+host_run.configure(data_dir=tempfile.mkdtemp(prefix="webserver-test-"))
+
+from utils import webserver  # noqa: E402
+
+
+def request(method, path, body=b""):
+    # One request that closes the connection, for the fetch fixture
+    data = "{} {} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n".format(method, path)
+    if body:
+        data += "Content-Length: {}\r\n".format(len(body))
+    return data.encode() + b"\r\n" + body
+
+
+def test_session_rejects_invalid_led_commands():
+    session = webserver.ReaderSession(None)
+
+    def handle(**command):
+        return session.handle(json.dumps(dict(command, cmd="led", color="green")))
+
+    for command in (
+        {"pattern": 5},
+        {"pattern": ""},
+        {"pattern": "+-" * 100},
+        {"pattern": "+-", "time_ms": 0},
+        {"pattern": "+-", "time_ms": "100"},
+        {"pattern": "+-", "n_times": -1},
+        {"pattern": "+-", "n_times": 1.5},
+        {"pattern": "+-", "n_times": 10**7},
+    ):
+        result = handle(**command)
+        assert not result["ok"], command
+
+    async def run():
+        result = handle(pattern="+-", time_ms=10, n_times=2)
+        blinking = webserver.led.is_green_blinking()
+        webserver.led.stop_blink()
+        return result, blinking
+
+    assert asyncio.run(run()) == ({"ok": True, "cmd": "led"}, True)
+
+
+def test_head_of_stream_does_not_subscribe(fetch):
+    async def run():
+        data = await fetch(webserver.app, request("HEAD", "/read/stream"))
+        return data, webserver.bus.subscribers, webserver.bus.task
+
+    data, subscribers, task = asyncio.run(run())
+    assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"text/event-stream" in data
+    assert not subscribers and task is None
+
+
+def test_head_of_export_releases_journal(fetch):
+    async def run():
+        data = await fetch(webserver.app, request("HEAD", "/events/export"))
+        return data, webserver.journal.exports
+
+    data, exports = asyncio.run(run())
+    assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert exports == 0
+
+
+def test_wait_for_invalid_chip_id(fetch):
+    async def run():
+        data = await fetch(webserver.app, request("GET", "/read/chip/abc"))
+        return data, webserver.bus.task
+
+    data, task = asyncio.run(run())
+    assert data.startswith(b"HTTP/1.1 400 ")
+    assert b"invalid card id" in data
+    assert task is None
+
+
+def test_upload_without_trailing_newline(fetch):
+    # 17999 bytes, over Request.max_body_length, so the body is streamed
+    body = "\n".join(str(tag) for tag in range(10000000, 10002000)).encode()
+
+    async def run():
+        data = await fetch(webserver.app, request("PUT", "/allowlist", body))
+        count = len(webserver.allowlist)
+        webserver.allowlist.replace(())
+        webserver.gate.update()
+        return data, count
+
+    data, count = asyncio.run(run())
+    assert len(body) > webserver.Request.max_body_length
+    assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert data.endswith(b'{"count": 2000}')
+    assert count == 2000
+
+
+if __name__ == "__main__":
+    from conftest import fetch
+
+    test_session_rejects_invalid_led_commands()
+    test_head_of_stream_does_not_subscribe(fetch)
+    test_head_of_export_releases_journal(fetch)
+    test_wait_for_invalid_chip_id(fetch)
+    test_upload_without_trailing_newline(fetch)
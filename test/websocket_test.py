@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+from microdot import Microdot
+from microdot.websocket import WebSocket, with_websocket
+
+app = Microdot()
+
+
+@app.route("/echo")
+@with_websocket
+async def echo(req, ws):
+    while True:
+        message = await ws.receive()
+        await ws.send(message)
+
+
+def client_frame(opcode, payload):
+    # client frames must be masked
+    mask = os.urandom(4)
+    header = WebSocket._encode_frame_header(opcode, len(payload))
+    header[1] |= 0x80
+    masked = bytearray(payload)
+    for i in range(len(masked)):
+        masked[i] ^= mask[i & 3]
+    return bytes(header) + mask + bytes(masked)
+
+
+async def read_server_frame(reader):
+    header = await reader.readexactly(2)
+    length = header[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    return header[0] & 0x0F, await reader.readexactly(length)
+
+
+async def loopback(app_server, messages):
+    async with app_server(app) as server:
+        reader, writer = await server.connect()
+        writer.write(
+            b"GET /echo HTTP/1.1\r\n"
+            b"Host: localhost\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+            b"Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        response = await reader.readuntil(b"\r\n\r\n")
+
+        replies = []
+        for opcode, payload in messages:
+            writer.write(client_frame(opcode, payload))
+            replies.append(await read_server_frame(reader))
+
+        writer.write(client_frame(WebSocket.CLOSE, b""))
+        replies.append(await read_server_frame(reader))
+        writer.close()
+
+    return response, replies
+
+
+def test_echo_loopback(app_server):
+    large = bytes(range(256)) * 4
+    response, replies = asyncio.run(
+        loopback(
+            app_server,
+            [
+                (WebSocket.TEXT, b"hello"),
+                (WebSocket.BINARY, large),
+                (WebSocket.PING, b"ping"),
+            ],
+        )
+    )
+
+    assert response.startswith(b"HTTP/1.1 101 ")
+    assert b"Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=" in response
+    assert replies == [
+        (WebSocket.TEXT, b"hello"),
+        (WebSocket.BINARY, large),
+        (WebSocket.PONG, b"ping"),
+        (WebSocket.CLOSE, b""),
+    ]
+
+
+def test_frame_header_lengths():
+    assert WebSocket._encode_frame_header(WebSocket.TEXT, 5) == b"\x81\x05"
+    assert WebSocket._encode_frame_header(WebSocket.BINARY, 300) == b"\x82\x7e\x01\x2c"
+    assert len(WebSocket._encode_frame_header(WebSocket.BINARY, 70000)) == 10
+
+
+if __name__ == "__main__":
+    from conftest import AppServer
+
+    test_echo_loopback(AppServer)
+    test_frame_header_lengths()
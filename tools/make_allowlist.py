@@ -0,0 +1,41 @@
+# Builds the allow-list file the webserver loads from flash, from a text file
+# with one decimal card id per line (blank lines and # comments are skipped).
+#
+# Run from the repository root on the host, then copy the file to the board:
+#   python -m tools.make_allowlist cards.txt allowlist.bin
+#   mpremote cp allowlist.bin :allowlist.bin
+import sys
+
+from utils.allowlist import PAGE_TAGS, save
+
+
+def read_card_ids(path):
+    tags = []
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+
+            tag = int(line)
+            if not 0 <= tag <= 0xFFFFFFFF:
+                raise ValueError("line {}: card id {} out of range".format(number, tag))
+            tags.append(tag)
+
+    return tags
+
+
+def main(argv):
+    if len(argv) not in (3, 4):
+        print("usage: make_allowlist.py CARDS_TXT ALLOWLIST_BIN [TAGS_PER_PAGE]")
+        return 2
+
+    page_tags = int(argv[3]) if len(argv) == 4 else PAGE_TAGS
+    tags = read_card_ids(argv[1])
+    save(argv[2], tags, page_tags)
+    print("Wrote {} cards to {}".format(len(set(tags)), argv[2]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,243 @@
+import os
+from array import array
+
+# Allow-list file layout, all words little-endian uint32:
+#   header   b"RFAL", count, tags per page, reserved
+#   table    count sorted, distinct tags
+#   index    first tag of every page of the table
+FILE_MAGIC = b"RFAL"
+HEADER_SIZE = 16
+PAGE_TAGS = 64
+
+
+def sorted_tags(tags):
+    # Sorted array('I') of the distinct tags
+    result = array("I")
+    last = None
+    for tag in sorted(tags):
+        if tag != last:
+            result.append(tag)
+            last = tag
+
+    return result
+
+
+def find(tags, tag, count=None):
+    # Binary search in the first count entries of a sorted array
+    low = 0
+    high = len(tags) if count is None else count
+    while low < high:
+        middle = (low + high) >> 1
+        value = tags[middle]
+        if value < tag:
+            low = middle + 1
+        elif value > tag:
+            high = middle
+        else:
+            return True
+
+    return False
+
+
+def find_page(index, tag):
+    # Last page whose first tag is <= tag, or -1 if tag sorts before them all
+    low = 0
+    high = len(index)
+    while low < high:
+        middle = (low + high) >> 1
+        if index[middle] <= tag:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low - 1
+
+
+def merge_tags(current, add, remove):
+    # Yields the sorted tags of current plus add, without those in remove.
+    # current is any sorted iterable, add and remove are sorted arrays.
+    j = 0
+    for tag in current:
+        while j < len(add) and add[j] < tag:
+            if not find(remove, add[j]):
+                yield add[j]
+            j += 1
+        if j < len(add) and add[j] == tag:
+            j += 1
+        if not find(remove, tag):
+            yield tag
+
+    while j < len(add):
+        if not find(remove, add[j]):
+            yield add[j]
+        j += 1
+
+
+class AllowListWriter:
+    # Writes an allow-list file from tags given in ascending order, one page
+    # at a time. The page index is kept in RAM and appended at the end, then
+    # the header is filled in.
+    def __init__(self, path, page_tags=PAGE_TAGS):
+        self.file = open(path, "wb")
+        self.page = array("I", bytes(4 * page_tags))
+        self.index = array("I")
+        self.fill = 0
+        self.count = 0
+        self.last = None
+        self.file.write(bytes(HEADER_SIZE))
+
+    def add(self, tag):
+        if self.last is not None and tag <= self.last:
+            if tag == self.last:
+                return
+            raise ValueError("tags must be written in ascending order")
+        self.last = tag
+
+        if self.fill == 0:
+            self.index.append(tag)
+        self.page[self.fill] = tag
+        self.fill += 1
+        self.count += 1
+
+        if self.fill == len(self.page):
+            self.file.write(self.page)
+            self.fill = 0
+
+    def close(self):
+        if self.fill:
+            self.file.write(memoryview(self.page)[: self.fill])
+        self.file.write(self.index)
+
+        self.file.seek(0)
+        self.file.write(FILE_MAGIC)
+        self.file.write(array("I", (self.count, len(self.page), 0)))
+        self.file.close()
+
+
+def save(path, tags, page_tags=PAGE_TAGS):
+    # Writes an allow-list file with the distinct tags, in any order
+    writer = AllowListWriter(path, page_tags)
+    for tag in sorted_tags(tags):
+        writer.add(tag)
+    writer.close()
+
+
+class AllowList:
+    # Authorized card ids as a sorted array('I'), 4 bytes per card, with
+    # O(log n) membership on the int the frame decoder produced. Changes
+    # build a new array and swap it in, so a lookup never sees a half
+    # updated list.
+    def __init__(self, tags=()):
+        self.tags = sorted_tags(tags)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, tag):
+        return find(self.tags, tag)
+
+    def replace(self, tags):
+        self.tags = sorted_tags(tags)
+
+    def update(self, add=(), remove=()):
+        merged = array("I")
+        for tag in merge_tags(self.tags, sorted_tags(add), sorted_tags(remove)):
+            merged.append(tag)
+
+        self.tags = merged
+
+
+class FlashAllowList:
+    # Same interface as AllowList for lists too large for RAM. Only the page
+    # index (4 bytes per page) is held in memory. A lookup binary searches the
+    # index, reads the one page the tag can be on into a reusable buffer and
+    # searches that, so RAM use does not grow with the list. A missing file
+    # is an empty list.
+    def __init__(self, path, page_tags=PAGE_TAGS):
+        self.path = path
+        self.file = None
+        self.count = 0
+        self.page_tags = page_tags
+        self.index = array("I")
+        self.page = array("I", bytes(4 * page_tags))
+
+        try:
+            self.open()
+        except OSError:
+            pass
+
+    def open(self):
+        file = open(self.path, "rb")
+        header = array("I", bytes(12))
+        if file.read(4) != FILE_MAGIC or file.readinto(header) != 12:
+            file.close()
+            raise ValueError("{} is not an allow-list file".format(self.path))
+
+        count, page_tags = header[0], header[1]
+        if page_tags == 0:
+            file.close()
+            raise ValueError("{} has no page size".format(self.path))
+
+        index = array("I", bytes(4 * ((count + page_tags - 1) // page_tags)))
+        file.seek(HEADER_SIZE + 4 * count)
+        file.readinto(index)
+
+        if page_tags != len(self.page):
+            self.page = array("I", bytes(4 * page_tags))
+        self.close()
+        self.file = file
+        self.count = count
+        self.page_tags = page_tags
+        self.index = index
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.count = 0
+        self.index = array("I")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, tag):
+        page = find_page(self.index, tag)
+        if page < 0:
+            return False
+
+        first = page * self.page_tags
+        self.file.seek(HEADER_SIZE + 4 * first)
+        self.file.readinto(self.page)
+        return find(self.page, tag, min(self.page_tags, self.count - first))
+
+    def __iter__(self):
+        # Every tag in order, read a page at a time
+        for page in range(len(self.index)):
+            first = page * self.page_tags
+            self.file.seek(HEADER_SIZE + 4 * first)
+            self.file.readinto(self.page)
+            for i in range(min(self.page_tags, self.count - first)):
+                yield self.page[i]
+
+    def replace(self, tags):
+        # Written next to the current list and swapped in like update(), so a
+        # write that fails (power loss, full flash) leaves the old list
+        temp_path = self.path + ".tmp"
+        save(temp_path, tags, self.page_tags)
+
+        self.close()
+        os.rename(temp_path, self.path)
+        self.open()
+
+    def update(self, add=(), remove=()):
+        # Streams the merge into a new file and swaps it in, holding only the
+        # changes and one page of the current list in RAM
+        temp_path = self.path + ".tmp"
+        writer = AllowListWriter(temp_path, self.page_tags)
+        for tag in merge_tags(self, sorted_tags(add), sorted_tags(remove)):
+            writer.add(tag)
+        writer.close()
+
+        self.close()
+        os.rename(temp_path, self.path)
+        self.open()
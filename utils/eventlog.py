@@ -0,0 +1,79 @@
+from array import array
+
+# Bits of an event's mode: the kinds of client that were reading when the tag
+# was seen
+MODE_READ = 0x01
+MODE_STREAM = 0x02
+MODE_WEBSOCKET = 0x04
+MODE_BATCH = 0x08
+MODE_GATE = 0x10
+
+MODE_NAMES = (
+    (MODE_READ, "read"),
+    (MODE_STREAM, "stream"),
+    (MODE_WEBSOCKET, "websocket"),
+    (MODE_BATCH, "batch"),
+    (MODE_GATE, "gate"),
+)
+
+# allowed is stored as one byte
+ALLOWED_UNKNOWN = 0
+ALLOWED_YES = 1
+ALLOWED_NO = 2
+
+
+def mode_names(mode):
+    return [name for bit, name in MODE_NAMES if mode & bit]
+
+
+class EventLog:
+    # The last size tag events in preallocated arrays, addressed by sequence
+    # number: event seq lives in slot seq % size. Events are rebuilt as
+    # (seq, tag, ticks_ms, allowed, mode) tuples only for the range that is
+    # asked for, the arrays themselves are never copied. ticks_ms are those of
+    # utils/ticks.py, which wrap at 2**30 and fit the "I" array on the host.
+    def __init__(self, size=256):
+        self.tags = array("I", bytes(4 * size))
+        self.ticks = array("I", bytes(4 * size))
+        self.modes = bytearray(size)
+        self.allowed = bytearray(size)
+        self.size = size
+        self.seq = 0
+
+    def append(self, tag, ticks, allowed=None, mode=0):
+        self.seq += 1
+        i = self.seq % self.size
+        self.tags[i] = tag
+        self.ticks[i] = ticks
+        self.modes[i] = mode
+        if allowed is None:
+            self.allowed[i] = ALLOWED_UNKNOWN
+        else:
+            self.allowed[i] = ALLOWED_YES if allowed else ALLOWED_NO
+        return self.seq
+
+    def first_seq(self):
+        # Oldest sequence number still in the log
+        return max(self.seq - self.size + 1, 1)
+
+    def event(self, seq):
+        i = seq % self.size
+        allowed = self.allowed[i]
+        return (
+            seq,
+            self.tags[i],
+            self.ticks[i],
+            None if allowed == ALLOWED_UNKNOWN else allowed == ALLOWED_YES,
+            self.modes[i],
+        )
+
+    def since(self, after_seq, limit):
+        # Up to limit events following after_seq, oldest first. A client that
+        # fell behind by more than the log size resumes at the oldest event.
+        if after_seq > self.seq:
+            # the sequence restarted (e.g. after a reboot), start over
+            after_seq = 0
+
+        first = max(after_seq + 1, self.first_seq())
+        last = min(self.seq, first + limit - 1)
+        return [self.event(seq) for seq in range(first, last + 1)]
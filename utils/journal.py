@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+from array import array
+
+from utils.eventlog import ALLOWED_NO, ALLOWED_UNKNOWN, ALLOWED_YES
+
+# Journal file layout, all words little-endian uint32:
+#   header   b"RFJ1", record size, reserved, reserved
+#   records  seq, time (RTC seconds), tag, mode | allowed << 8
+JOURNAL_MAGIC = b"RFJ1"
+HEADER_SIZE = 16
+RECORD_SIZE = 16
+BLOCK_RECORDS = 32
+FLUSH_MS = 60000
+
+
+def journal_header():
+    header = bytearray(HEADER_SIZE)
+    header[:4] = JOURNAL_MAGIC
+    header[4] = RECORD_SIZE
+    return header
+
+
+def file_size(path):
+    try:
+        return os.stat(path)[6]
+    except OSError:
+        return 0
+
+
+class Journal:
+    # Append-only record of tag events that survives a reboot. Records are
+    # collected in a block buffer in RAM and written one full block at a time
+    # (or every flush_ms by run()), so flash sees a few large writes instead
+    # of one small write per tag. Once the file would grow past max_size it
+    # is renamed to path + ".1", replacing the previous one, and a new file
+    # is started. A failed write is counted in errors instead of raised, so
+    # the reader keeps going without flash. The block is kept and written
+    # again with the next record, which is dropped while that still fails.
+    def __init__(self, path, max_size=64 * 1024, block_records=BLOCK_RECORDS):
+        self.path = path
+        self.max_size = max_size
+        self.block = array("I", bytes(RECORD_SIZE * block_records))
+        self.pending = 0
+        self.exports = 0
+        self.errors = 0
+        self.dropped = 0
+        self.size = file_size(path)
+
+    def append(self, event):
+        if 4 * self.pending == len(self.block) and not self.write():
+            self.dropped += 1
+            return
+
+        seq, tag, ticks, allowed, mode = event
+        if allowed is None:
+            allowed = ALLOWED_UNKNOWN
+        else:
+            allowed = ALLOWED_YES if allowed else ALLOWED_NO
+
+        i = 4 * self.pending
+        self.block[i] = seq
+        self.block[i + 1] = int(time.time())
+        self.block[i + 2] = tag
+        self.block[i + 3] = mode | allowed << 8
+        self.pending += 1
+
+        if 4 * self.pending == len(self.block):
+            self.write()
+
+    def write(self):
+        # flush(), returns False instead of raising if it failed
+        try:
+            self.flush()
+        except OSError:
+            self.errors += 1
+            return False
+        return True
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        length = RECORD_SIZE * self.pending
+        if self.size + length > self.max_size and not self.exports:
+            # an export in progress holds the files open, rotate afterwards
+            self.rotate()
+
+        with open(self.path, "ab") as file:
+            if self.size == 0:
+                self.size = file.write(journal_header())
+            file.write(memoryview(self.block)[: 4 * self.pending])
+
+        self.size += length
+        self.pending = 0
+
+    def rotate(self):
+        try:
+            os.remove(self.path + ".1")
+        except OSError:
+            pass
+
+        if self.size:
+            os.rename(self.path, self.path + ".1")
+        self.size = 0
+
+    async def run(self, flush_ms=FLUSH_MS):
+        # Bounds how long a partial block stays in RAM only
+        while True:
+            await asyncio.sleep(flush_ms / 1000)
+            self.write()
+
+
+class JournalExport:
+    # File-like stream over the rotated and the current journal, as one
+    # header followed by all records, for Response.send_file(). Pending
+    # records are written first, through Journal.write() so a flash error is
+    # counted and only leaves them out. The length is fixed when the export
+    # starts, and rotation waits until the export is closed.
+    def __init__(self, journal):
+        journal.write()
+        journal.exports += 1
+        self.journal = journal
+        self.header = journal_header()
+        self.parts = []
+        self.length = HEADER_SIZE
+
+        for path in (journal.path + ".1", journal.path):
+            size = file_size(path) - HEADER_SIZE
+            if size > 0:
+                self.parts.append((path, size))
+                self.length += size
+
+        self.file = None
+        self.remaining = 0
+
+    def read(self, n=-1):
+        if n < 0:
+            n = self.length
+        data = bytearray()
+
+        if self.header:
+            data += self.header[:n]
+            self.header = self.header[n:]
+
+        while len(data) < n:
+            if self.remaining == 0:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                if not self.parts:
+                    break
+
+                path, self.remaining = self.parts.pop(0)
+                self.file = open(path, "rb")
+                self.file.seek(HEADER_SIZE)
+
+            chunk = self.file.read(min(n - len(data), self.remaining))
+            if not chunk:
+                self.remaining = 0
+                continue
+            data += chunk
+            self.remaining -= len(chunk)
+
+        return bytes(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+        if self.journal is not None:
+            self.journal.exports -= 1
+            self.journal = None
@@ -1,64 +1,283 @@
-import _thread
+import asyncio
+from array import array
 
 import machine
 import utime
 
+try:
+    import rp2
+except ImportError:  # no PIO, patterns are played by the scheduler
+    rp2 = None
+
+# Pattern steps: "+" turns the LED on for one step, "-" turns it off and any
+# other character keeps the current state
+STEP_OFF = 0
+STEP_ON = 1
+STEP_HOLD = 2
+
+# Compiled patterns by pattern string. Patterns also come from clients, so
+# only the first MAX_PATTERNS (the ones the firmware uses) are kept.
+PATTERNS = {}
+MAX_PATTERNS = 8
+
+
+def compile_pattern(pattern):
+    steps = PATTERNS.get(pattern)
+    if steps is None:
+        steps = bytes(
+            STEP_ON if state == "+" else STEP_OFF if state == "-" else STEP_HOLD
+            for state in pattern
+        )
+        if len(PATTERNS) < MAX_PATTERNS:
+            PATTERNS[pattern] = steps
+
+    return steps
+
+
+# The PIO program shifts one bit per step out of a 32-bit word, first step in
+# bit 0, and holds it for a fixed number of cycles. When the FIFO is empty
+# "pull(noblock)" reloads the last word from X, so the last word repeats.
+PIO_CYCLES_PER_STEP = 1027
+PIO_MIN_FREQ = 2000
+PIO_MAX_FREQ = 125_000_000
+PIO_FIFO_WORDS = 8
+
+# Compiled bitstreams by (steps, repeats), only the first MAX_BITSTREAMS are
+# kept like with PATTERNS
+BITSTREAMS = {}
+MAX_BITSTREAMS = 8
+
+if rp2 is not None:
+
+    @rp2.asm_pio(
+        out_init=rp2.PIO.OUT_LOW,
+        out_shiftdir=rp2.PIO.SHIFT_RIGHT,
+        fifo_join=rp2.PIO.JOIN_TX,
+    )
+    def pattern_program():
+        pull(noblock)  # noqa: F821
+        mov(x, osr)  # noqa: F821
+        label("bit")  # noqa: F821
+        out(pins, 1)  # noqa: F821
+        set(y, 31)  # noqa: F821
+        label("delay")  # noqa: F821
+        jmp(y_dec, "delay")[31]  # noqa: F821
+        jmp(not_osre, "bit")  # noqa: F821
+
+
+def compile_bitstream(steps, repeats):
+    # The steps as 32-bit words for the PIO program, or None if the hardware
+    # cannot play them. A pattern that repeats forever has to tile one word,
+    # which then repeats from X. A pattern played a number of times is
+    # followed by an all-off word and has to fit in the joined TX FIFO.
+    key = (steps, repeats)
+    if key in BITSTREAMS:
+        return BITSTREAMS[key]
+
+    if not steps or STEP_HOLD in steps:
+        return None
+    if repeats < 0:
+        if 32 % len(steps):
+            return None
+        words = array("I", bytes(4))
+        steps = steps * (32 // len(steps))
+    else:
+        # checked before the steps are repeated, repeats comes from clients
+        if len(steps) * repeats > 32 * (PIO_FIFO_WORDS - 1):
+            return None
+        steps = steps * repeats
+        words = array("I", bytes(4 * ((len(steps) + 31) // 32 + 1)))
+
+    for i in range(len(steps)):
+        if steps[i] == STEP_ON:
+            words[i >> 5] |= 1 << (i & 31)
+
+    if len(BITSTREAMS) < MAX_BITSTREAMS:
+        BITSTREAMS[key] = words
+    return words
+
+
+class PIOPlayer:
+    # Plays compiled bitstreams on one PIO state machine, which drives the
+    # pin without any CPU time until it is stopped.
+    def __init__(self, state_machine, pin_number):
+        self.state_machine = state_machine
+        self.pin_number = pin_number
+        self.sm = None
+
+    def play(self, words, step_ms):
+        freq = PIO_CYCLES_PER_STEP * 1000 // step_ms if step_ms > 0 else 0
+        if not PIO_MIN_FREQ <= freq <= PIO_MAX_FREQ:
+            return False
+
+        self.sm = rp2.StateMachine(
+            self.state_machine,
+            pattern_program,
+            freq=freq,
+            out_base=machine.Pin(self.pin_number),
+        )
+        self.sm.put(words)
+        self.sm.active(1)
+        return True
+
+    def stop(self):
+        # Returns True if the state machine was running
+        if self.sm is None:
+            return False
+
+        self.sm.active(0)
+        self.sm = None
+        return True
+
+
+class LEDScheduler:
+    # A single asyncio task plays the patterns of all LEDs. It sleeps until
+    # the earliest step of any LED is due and is woken when a pattern starts.
+    # Step times are laid out on a fixed grid from the start of a pattern, so
+    # a late wakeup does not shift the steps after it.
+    def __init__(self):
+        self.leds = []
+        self.changed = None
+        self.task = None
+
+    def add(self, led):
+        if led not in self.leds:
+            self.leds.append(led)
+
+        if self.task is None or self.task.done():
+            self.changed = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+        else:
+            self.changed.set()
+
+    def remove(self, led):
+        if led in self.leds:
+            self.leds.remove(led)
+
+    async def run(self):
+        while True:
+            now = utime.ticks_ms()
+            wait_ms = None
+
+            for i in range(len(self.leds) - 1, -1, -1):
+                led = self.leds[i]
+                if not led.advance(now):
+                    self.remove(led)
+                    continue
+
+                remaining_ms = utime.ticks_diff(led.next_step(), now)
+                if wait_ms is None or remaining_ms < wait_ms:
+                    wait_ms = remaining_ms
+
+            self.changed.clear()
+            if wait_ms is None:
+                await self.changed.wait()
+                continue
+
+            try:
+                await asyncio.wait_for(self.changed.wait(), wait_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = LEDScheduler()
+
 
 class LED:
-    def __init__(self, pin_number):
+    # Blink patterns are played by the PIO state machine given, if the port
+    # has PIO and the pattern fits, otherwise by the scheduler.
+    def __init__(self, pin_number, scheduler=scheduler, state_machine=None):
         self.__pin = machine.Pin(pin_number, machine.Pin.OUT)
         self.__state = False  # Internal state: False means off, True means on
         self.__blinking = False
-        self.__timeout_timer = None
+        self.__scheduler = scheduler
+        self.__pio = None
+        if rp2 is not None and state_machine is not None:
+            self.__pio = PIOPlayer(state_machine, pin_number)
+
+        # pattern being played, advanced by the scheduler
+        self.__steps = b""
+        self.__step = 0
+        self.__step_ms = 0
+        self.__repeats = 0  # -1 repeats forever
+        self.__deadline = 0
+
+    def __set(self, state):
+        self.__pin.value(1 if state else 0)
+        self.__state = state
+
+    def __play(self, steps, step_ms, repeats, blinking):
+        self.__steps = steps
+        self.__step = 0
+        self.__step_ms = max(step_ms, 1)  # advance() never catches up with 0
+        self.__repeats = repeats
+        self.__blinking = blinking
+        self.__deadline = utime.ticks_ms()
+        if self.advance(self.__deadline):
+            self.__scheduler.add(self)
+
+    def __cancel(self):
+        self.__scheduler.remove(self)
+        self.__blinking = False
+        if self.__pio is not None and self.__pio.stop():
+            # hand the pin back from the PIO to the CPU
+            self.__pin.init(machine.Pin.OUT)
 
     def on(self, timeout_ms=None):
-        self.__pin.value(1)
-        self.__state = True  # Update internal state to reflect LED is on
+        self.__cancel()
+        self.__set(True)  # Update internal state to reflect LED is on
         if timeout_ms is not None:
-            self.__timeout_timer = machine.Timer()
-            self.__timeout_timer.init(
-                period=timeout_ms,
-                mode=machine.Timer.ONE_SHOT,
-                callback=self.__timeout_callback,
-            )
-
-    def __timeout_callback(self, timer):
-        self.off()
-        self.timeout_timer = None
+            # one step that keeps the LED on, it is turned off at the end
+            self.__play(compile_pattern("+"), timeout_ms, 1, False)
 
     def off(self):
-        self.__pin.value(0)
-        self.__state = False  # Update internal state to reflect LED is off
-        if self.__timeout_timer is not None:
-            self.__timeout_timer.deinit()
-            self.__timeout_timer = None
+        self.__cancel()
+        self.__set(False)  # Update internal state to reflect LED is off
+
+    def advance(self, now):
+        # Applies every step that is due, returns False when the pattern ended
+        while utime.ticks_diff(self.__deadline, now) <= 0:
+            if self.__step == len(self.__steps):
+                self.__step = 0
+                if self.__repeats > 0:
+                    self.__repeats -= 1
+                if self.__repeats == 0 or not self.__steps:
+                    self.__cancel()
+                    self.__set(False)
+                    return False
+
+            step = self.__steps[self.__step]
+            if step != STEP_HOLD:
+                self.__set(step == STEP_ON)
+            self.__step += 1
+            self.__deadline = utime.ticks_add(self.__deadline, self.__step_ms)
+
+        return True
+
+    def next_step(self):
+        return self.__deadline
 
     def blink(self, pattern, time_ms, continuous=False, n_times=1):
-        self.stop_blink()
+        if time_ms < 1:
+            raise ValueError("time_ms must be at least 1")
+
+        self.__cancel()
+        steps = compile_pattern(pattern)
+        repeats = -1 if continuous else n_times
 
-        def blink_thread():
-            self.__blinking = True
-            while self.__blinking:
-                for _ in range(n_times):
-                    if not self.__blinking:
-                        break
-                    for state in pattern:
-                        if not self.__blinking:
-                            break
-                        if state == "+":
-                            self.on()
-                        elif state == "-":
-                            self.off()
-                        utime.sleep_ms(time_ms)
-                if not continuous:
-                    break
-            self.off()
-
-        _thread.start_new_thread(blink_thread, ())
+        if self.__pio is not None:
+            words = compile_bitstream(steps, repeats)
+            if words is not None and self.__pio.play(words, time_ms):
+                self.__blinking = True
+                if repeats > 0:
+                    # the scheduler only has to notice the end of the pattern
+                    duration_ms = len(steps) * repeats * time_ms
+                    self.__play(compile_pattern("."), duration_ms, 1, True)
+                return
+
+        self.__play(steps, time_ms, repeats, True)
 
     def stop_blink(self):
-        self.__blinking = False
-        utime.sleep_ms(10)  # Ensure thread has time to stop
         self.off()
 
     def is_on(self):
@@ -69,9 +288,9 @@ class LED:
 
 
 class DualColorLED:
-    def __init__(self, green_pin_number, red_pin_number):
-        self.__green_led = LED(green_pin_number)
-        self.__red_led = LED(red_pin_number)
+    def __init__(self, green_pin_number, red_pin_number, state_machines=(0, 1)):
+        self.__green_led = LED(green_pin_number, state_machine=state_machines[0])
+        self.__red_led = LED(red_pin_number, state_machine=state_machines[1])
 
     def green_on(self, timeout_ms=None):
         self.__red_led.off()  # Ensure the red LED is off
@@ -88,14 +307,9 @@ class DualColorLED:
     def blink(self, color, pattern, time_ms, continuous=False, n_times=1):
         self.stop_blink()
 
-        def blink_thread(led):
-            led.blink(pattern, time_ms, continuous, n_times)
-
         if color == "green":
-            # _thread.start_new_thread(blink_thread, (self.__green_led,))
             self.__green_led.blink(pattern, time_ms, continuous, n_times)
         elif color == "red":
-            # _thread.start_new_thread(blink_thread, (self.__red_led,))
             self.__red_led.blink(pattern, time_ms, continuous, n_times)
 
     def stop_blink(self):
@@ -115,14 +329,14 @@ class DualColorLED:
         return self.__red_led.is_blinking()
 
 
-# Example usage:
+# Example usage (patterns and timeouts are played by the asyncio loop):
 # dual_led = DualColorLED(25, 26)  # Assuming the green LED is connected to GPIO 25 and red LED to GPIO 26
 # dual_led.green_on()  # Turn on the green LED
-# utime.sleep(1)
+# await asyncio.sleep(1)
 # dual_led.red_on()  # Turn on the red LED (this will turn off the green LED)
-# utime.sleep(1)
+# await asyncio.sleep(1)
 # dual_led.blink('green', "+++--", 500, continuous=True)  # Blink green LED with pattern
-# utime.sleep(10)  # Let it blink for 10 seconds
+# await asyncio.sleep(10)  # Let it blink for 10 seconds
 # dual_led.stop_blink()  # Stop blinking
 
 # Check the internal state of green LED
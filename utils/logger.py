@@ -1,64 +1,291 @@
-import utime
+import asyncio
+import os
+import sys
+from array import array
+
+try:
+    import utime
+except ImportError:  # CPython
+    import time as utime
+
+DEBUG = 0
+INFO = 1
+WARNING = 2
+ERROR = 3
+CRITICAL = 4
+
+LEVEL_NAMES = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LINE_SIZE = 256
+FLUSH_MS = 200
+
+
+def stdout_stream():
+    return getattr(sys.stdout, "buffer", sys.stdout)
+
+
+class LogRing:
+    # Recent log lines in a preallocated byte ring, numbered by sequence.
+    # The oldest lines are overwritten once either the bytes or the record
+    # slots run out. run() hands new lines to the sinks in batches from a
+    # background task, so logging itself is only a copy into RAM.
+    def __init__(self, size=4096, records=64):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.offsets = array("H", bytes(2 * records))
+        self.lengths = array("H", bytes(2 * records))
+        self.size = size
+        self.records = records
+        self.head = 0
+        self.used = 0
+        self.seq = 0
+        self.floor = 1  # oldest sequence number still in the ring
+        self.flushed = 0
+        self.dropped = 0
+        self.sinks = []
+
+    def drop_oldest(self):
+        self.used -= self.lengths[self.floor % self.records]
+        self.floor += 1
+
+    def append(self, data):
+        n = min(len(data), self.size)
+        self.seq += 1
+        if self.seq - self.floor == self.records:
+            self.drop_oldest()
+        while self.used + n > self.size:
+            self.drop_oldest()
+
+        slot = self.seq % self.records
+        self.offsets[slot] = self.head
+        self.lengths[slot] = n
+
+        first = min(n, self.size - self.head)
+        self.view[self.head : self.head + first] = data[:first]
+        if first < n:
+            self.view[: n - first] = data[first:n]
+        self.head = (self.head + n) % self.size
+        self.used += n
+
+    def copy(self, first, last):
+        # The bytes of records first to last, which lie back to back
+        start = self.offsets[first % self.records]
+        length = 0
+        for seq in range(first, last + 1):
+            length += self.lengths[seq % self.records]
+
+        data = bytearray(length)
+        end = min(start + length, self.size)
+        data[: end - start] = self.view[start:end]
+        if end - start < length:
+            data[end - start :] = self.view[: length - (end - start)]
+        return data
+
+    def since(self, after_seq, limit):
+        # Up to limit (seq, line) pairs after after_seq, oldest first
+        if after_seq > self.seq:
+            # the sequence restarted (e.g. after a reboot), start over
+            after_seq = 0
+
+        first = max(after_seq + 1, self.floor)
+        last = min(self.seq, first + limit - 1)
+        return [(seq, bytes(self.copy(seq, seq))) for seq in range(first, last + 1)]
+
+    async def flush(self):
+        first = max(self.flushed + 1, self.floor)
+        if first > self.seq:
+            return
+
+        self.dropped += first - self.flushed - 1
+        last = self.seq
+        # copied, so sinks may yield while new lines overwrite the ring
+        batch = self.copy(first, last)
+        self.flushed = last
+
+        for sink in self.sinks:
+            try:
+                await sink.write(batch)
+            except Exception:
+                sink.errors += 1
+
+    async def run(self, flush_ms=FLUSH_MS):
+        while True:
+            await self.flush()
+            await asyncio.sleep(flush_ms / 1000)
+
+
+class StreamSink:
+    def __init__(self, stream=None):
+        self.stream = stream or stdout_stream()
+        self.errors = 0
+
+    async def write(self, data):
+        self.stream.write(data)
+
+
+class FileSink:
+    # Appends batches to a file on flash, which is renamed to path + ".1"
+    # once it reaches max_size
+    def __init__(self, path, max_size=32 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.errors = 0
+        try:
+            self.size = os.stat(path)[6]
+        except OSError:
+            self.size = 0
+
+    async def write(self, data):
+        if self.size + len(data) > self.max_size and self.size:
+            try:
+                os.remove(self.path + ".1")
+            except OSError:
+                pass
+            os.rename(self.path, self.path + ".1")
+            self.size = 0
+
+        with open(self.path, "ab") as file:
+            file.write(data)
+        self.size += len(data)
+
+
+class HTTPSink:
+    # POSTs each batch as text/plain to a collector
+    def __init__(self, host, port=80, path="/logs"):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.errors = 0
+
+    async def write(self, data):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(
+                "POST {} HTTP/1.0\r\nHost: {}\r\nContent-Type: text/plain\r\n"
+                "Content-Length: {}\r\n\r\n".format(
+                    self.path, self.host, len(data)
+                ).encode()
+            )
+            writer.write(data)
+            await writer.drain()
+            status = await reader.readline()
+            if b" 2" not in status[:13]:
+                self.errors += 1
+        finally:
+            writer.close()
+            await writer.wait_closed()
 
 
 class Logger:
-    def __init__(self, log_level="INFO"):
-        self.log_levels = {
-            "DEBUG": 0,
-            "INFO": 1,
-            "WARNING": 2,
-            "ERROR": 3,
-            "CRITICAL": 4,
-        }
+    # Messages are format strings with their arguments passed separately, so
+    # a message below the level costs one bit test and is never formatted.
+    # The timestamp is formatted at most once per second and each line is
+    # assembled in a preallocated buffer, then written to the stream or, if a
+    # LogRing is given, copied into the ring for its sinks.
+    def __init__(self, log_level="INFO", stream=None, ring=None):
+        self.log_levels = {name: level for level, name in enumerate(LEVEL_NAMES)}
+        self.labels = [" [{}] ".format(name).encode() for name in LEVEL_NAMES]
         self.current_level = log_level  # Default log level
         self.enabled_levels = {level: True for level in self.log_levels}
+        self.active = 0
+        self.update_active()
+
+        self.stream = stream or stdout_stream()
+        self.ring = ring
+        self.buffer = bytearray(LINE_SIZE)
+        self.view = memoryview(self.buffer)
+        self.second = None
+        self.stamp = b""
+
+    def update_active(self):
+        # Bit n is set while messages of level n are written
+        minimum = self.log_levels[self.current_level]
+        self.active = 0
+        for name, level in self.log_levels.items():
+            if level >= minimum and self.enabled_levels[name]:
+                self.active |= 1 << level
 
     def set_level(self, level: str):
         if level in self.log_levels:
             self.current_level = level
+            self.update_active()
         else:
             raise ValueError(f"Invalid log level '{level}'")
 
     def enable_level(self, level):
         if level in self.log_levels:
             self.enabled_levels[level] = True
+            self.update_active()
         else:
             raise ValueError(f"Invalid log level '{level}'")
 
     def disable_level(self, level):
         if level in self.log_levels:
             self.enabled_levels[level] = False
+            self.update_active()
         else:
             raise ValueError(f"Invalid log level '{level}'")
 
-    def log(self, level, message):
-        if level in self.log_levels:
-            if (
-                self.log_levels[level] >= self.log_levels[self.current_level]
-                and self.enabled_levels[level]
-            ):
-                timestamp = utime.localtime()
-                timestamp_str = "{:04}-{:02}-{:02} {:02}:{:02}:{:02}".format(
-                    timestamp[0],
-                    timestamp[1],
-                    timestamp[2],
-                    timestamp[3],
-                    timestamp[4],
-                    timestamp[5],
-                )
-                print("[{}] [{}] {}".format(timestamp_str, level, message))
-
-    def debug(self, message):
-        self.log("DEBUG", message)
-
-    def info(self, message):
-        self.log("INFO", message)
-
-    def warning(self, message):
-        self.log("WARNING", message)
-
-    def error(self, message):
-        self.log("ERROR", message)
-
-    def critical(self, message):
-        self.log("CRITICAL", message)
+    def is_enabled(self, level):
+        return self.active & (1 << level) != 0
+
+    def timestamp(self):
+        second = int(utime.time())
+        if second != self.second:
+            timestamp = utime.localtime(second)
+            self.stamp = "[{:04}-{:02}-{:02} {:02}:{:02}:{:02}]".format(
+                timestamp[0],
+                timestamp[1],
+                timestamp[2],
+                timestamp[3],
+                timestamp[4],
+                timestamp[5],
+            ).encode()
+            self.second = second
+
+        return self.stamp
+
+    def write(self, level, message, args):
+        if args:
+            message = message.format(*args)
+
+        buffer = self.buffer
+        n = 0
+        for part in (self.timestamp(), self.labels[level], message.encode()):
+            length = min(len(part), LINE_SIZE - 1 - n)
+            # a long line is cut before the character that does not fit, not
+            # inside its UTF-8 continuation bytes
+            while length < len(part) and length and part[length] & 0xC0 == 0x80:
+                length -= 1
+            buffer[n : n + length] = part[:length] if length < len(part) else part
+            n += length
+        buffer[n] = 0x0A
+
+        if self.ring is not None:
+            self.ring.append(self.view[: n + 1])
+        else:
+            self.stream.write(self.view[: n + 1])
+
+    def log(self, level, message, *args):
+        level = self.log_levels.get(level)
+        if level is not None and self.active & (1 << level):
+            self.write(level, message, args)
+
+    def debug(self, message, *args):
+        if self.active & 0x01:
+            self.write(DEBUG, message, args)
+
+    def info(self, message, *args):
+        if self.active & 0x02:
+            self.write(INFO, message, args)
+
+    def warning(self, message, *args):
+        if self.active & 0x04:
+            self.write(WARNING, message, args)
+
+    def error(self, message, *args):
+        if self.active & 0x08:
+            self.write(ERROR, message, args)
+
+    def critical(self, message, *args):
+        if self.active & 0x10:
+            self.write(CRITICAL, message, args)
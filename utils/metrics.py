@@ -0,0 +1,137 @@
+from array import array
+
+from utils.ticks import ticks_diff, ticks_us
+
+# Upper bounds of the latency histogram buckets in microseconds. One more
+# bucket counts everything above them (le="+Inf").
+BUCKETS_US = (
+    1000,
+    2500,
+    5000,
+    10000,
+    25000,
+    50000,
+    100000,
+    250000,
+    500000,
+    1000000,
+    2500000,
+    5000000,
+)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+MAX_ROUTES = 32
+CHUNK_SIZE = 512
+
+FAMILIES = (
+    ("http_requests_total", "counter", "Requests by route and status class."),
+    (
+        "http_request_duration_seconds",
+        "histogram",
+        "Time from dispatch until the response is written.",
+    ),
+    ("http_response_bytes_total", "counter", "Bytes written in responses."),
+)
+
+def seconds(us):
+    # Microseconds as a decimal number of seconds, without float rounding
+    return "{}.{:06}".format(us // 1000000, us % 1000000)
+
+
+BUCKET_LABELS = tuple(seconds(us) for us in BUCKETS_US) + ("+Inf",)
+
+
+class Metrics:
+    # Request counters per route, for app.metrics. A route (method and URL
+    # pattern) gets a slot the first time it is seen and all counters live in
+    # arrays preallocated for max_routes slots, so recording a request is a
+    # few index increments. Slot 0 counts requests that matched no route and
+    # those of routes past max_routes. Latency is measured with ticks_us from
+    # dispatch until the response is written. The latency and byte totals are
+    # plain ints, as they outgrow 32 bits.
+    def __init__(self, max_routes=MAX_ROUTES):
+        self.max_routes = max_routes
+        self.slots = {}
+        self.labels = ['method="",route="unmatched"']
+        self.statuses = array("I", bytes(4 * len(STATUS_CLASSES) * max_routes))
+        self.buckets = array("I", bytes(4 * len(BUCKET_LABELS) * max_routes))
+        self.latency_us = [0] * max_routes
+        self.written = [0] * max_routes
+
+    def start(self):
+        return ticks_us()
+
+    def slot(self, req):
+        if req is None or req.route is None:
+            return 0
+
+        key = req.method + " " + req.route
+        slot = self.slots.get(key)
+        if slot is None:
+            if len(self.labels) == self.max_routes:
+                return 0
+            slot = self.slots[key] = len(self.labels)
+            self.labels.append('method="{}",route="{}"'.format(req.method, req.route))
+        return slot
+
+    def record(self, req, res, start, written):
+        elapsed = ticks_diff(ticks_us(), start)
+        slot = self.slot(req)
+
+        status = min(max(res.status_code // 100, 1), 5) - 1
+        self.statuses[slot * len(STATUS_CLASSES) + status] += 1
+
+        bucket = 0
+        while bucket < len(BUCKETS_US) and elapsed > BUCKETS_US[bucket]:
+            bucket += 1
+        self.buckets[slot * len(BUCKET_LABELS) + bucket] += 1
+
+        self.latency_us[slot] += elapsed
+        self.written[slot] += written or 0
+
+    def count(self, slot):
+        first = slot * len(BUCKET_LABELS)
+        return sum(self.buckets[first : first + len(BUCKET_LABELS)])
+
+    def samples(self, family, slot):
+        # The Prometheus sample lines of one metric family for one route
+        name = FAMILIES[family][0]
+        labels = self.labels[slot]
+
+        if family == 0:
+            for i, status in enumerate(STATUS_CLASSES):
+                value = self.statuses[slot * len(STATUS_CLASSES) + i]
+                if value:
+                    yield '{}{{{},status="{}"}} {}\n'.format(
+                        name, labels, status, value
+                    )
+        elif family == 1:
+            total = 0
+            for i, le in enumerate(BUCKET_LABELS):
+                total += self.buckets[slot * len(BUCKET_LABELS) + i]
+                yield '{}_bucket{{{},le="{}"}} {}\n'.format(name, labels, le, total)
+            latency = seconds(self.latency_us[slot])
+            yield "{}_sum{{{}}} {}\n".format(name, labels, latency)
+            yield "{}_count{{{}}} {}\n".format(name, labels, total)
+        else:
+            yield "{}{{{}}} {}\n".format(name, labels, self.written[slot])
+
+    def export(self):
+        # Generator of the Prometheus text format, to be used as a response
+        # body. Lines are formatted one at a time and handed out in chunks of
+        # about CHUNK_SIZE bytes, so the whole text is never held in RAM.
+        chunk = bytearray()
+        for family, (name, kind, description) in enumerate(FAMILIES):
+            chunk += "# HELP {} {}\n# TYPE {} {}\n".format(
+                name, description, name, kind
+            ).encode()
+            for slot in range(len(self.labels)):
+                if not self.count(slot):
+                    continue
+                for line in self.samples(family, slot):
+                    chunk += line.encode()
+                if len(chunk) >= CHUNK_SIZE:
+                    yield bytes(chunk)
+                    chunk = bytearray()
+
+        if chunk:
+            yield bytes(chunk)
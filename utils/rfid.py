@@ -1,54 +1,397 @@
+import _thread
+import asyncio
 import time
+from array import array
+
+from utils.ringbuffer import RingBuffer
+from utils.ticks import sleep_ms, ticks_diff, ticks_ms, ticks_us
+
+try:
+    from machine import UART, Pin, idle
+except ImportError:  # running on the host, a stream must be passed in
+    UART = Pin = None
+
+    def idle():
+        time.sleep(0.001)
+
+
+try:
+    from asyncio import ThreadSafeFlag
+except ImportError:  # CPython
+
+    class ThreadSafeFlag:
+        # asyncio.Event that may be set from an IRQ handler or another thread
+        def __init__(self):
+            self.event = asyncio.Event()
+            self.loop = None
+            self.pending = False
+
+        def set(self):
+            if self.loop is None:
+                self.pending = True
+            else:
+                self.loop.call_soon_threadsafe(self.event.set)
+
+        def clear(self):
+            self.pending = False
+            self.event.clear()
+
+        async def wait(self):
+            self.loop = asyncio.get_running_loop()
+            if not self.pending:
+                await self.event.wait()
+            self.clear()
+
+
+FRAME_LENGTH = 14
+FRAME_HEADER = 0x02
+FRAME_STOP = 0x03
+
+# Longest a blocking read sleeps before the read loops recheck their timeout
+READ_WAIT_MS = 100
+
+# Reasons a frame is dropped, indexes into ReaderStats.drops
+DROP_LENGTH = 0
+DROP_HEADER = 1
+DROP_STOP = 2
+DROP_HEX = 3
+DROP_CHECKSUM = 4
+DROP_NAMES = ("length", "header", "stop", "hex", "checksum")
+
+# ASCII byte -> hex digit value, 0xFF for anything that is not a hex digit
+HEX_NIBBLES = bytearray(b"\xff" * 256)
+for _i, _c in enumerate(b"0123456789ABCDEF"):
+    HEX_NIBBLES[_c] = _i
+    HEX_NIBBLES[b"0123456789abcdef"[_i]] = _i
+
+
+class ReaderStats:
+    # Counters of the decode path, plain ints and one small array that are
+    # bumped in place, so counting allocates nothing. bytes is everything fed
+    # to the decoder, skipped the bytes outside of any frame, frames the
+    # frames decoded to a tag and drops the frames lost by DROP_* reason. The
+    # latency is from the first byte of a frame reaching the reader (the
+    # capture layer's receive time, if it has one) to its tag being decoded.
+    def __init__(self):
+        self.drops = array("I", bytes(4 * len(DROP_NAMES)))
+        self.clear()
+
+    def clear(self):
+        self.bytes = 0
+        self.skipped = 0
+        self.frames = 0
+        self.resyncs = 0
+        for i in range(len(self.drops)):
+            self.drops[i] = 0
+        self.latency_us = 0
+        self.max_latency_us = 0
+        self.total_latency_us = 0
+
+    def decoded(self, start_us):
+        latency = ticks_diff(ticks_us(), start_us)
+        self.frames += 1
+        self.latency_us = latency
+        self.total_latency_us += latency
+        if latency > self.max_latency_us:
+            self.max_latency_us = latency
+
+    def as_dict(self):
+        return {
+            "bytes": self.bytes,
+            "skipped": self.skipped,
+            "frames": self.frames,
+            "resyncs": self.resyncs,
+            "drops": {name: self.drops[i] for i, name in enumerate(DROP_NAMES)},
+            "latency_us": {
+                "last": self.latency_us,
+                "max": self.max_latency_us,
+                "mean": self.total_latency_us // self.frames if self.frames else 0,
+            },
+        }
+
+
+class FrameDecoder:
+    # Reassembles RDM6300 frames from arbitrarily split or merged UART chunks.
+    # A partial frame is kept in a preallocated buffer until the next feed(),
+    # and a header or stop byte in the wrong place restarts the frame. With a
+    # parse callback, complete frames are decoded in place and only non-None
+    # results are returned. Frames cut short or without their stop byte are
+    # counted in stats, a parse callback counts the frames it rejects.
+    def __init__(self, parse=None, stats=None):
+        self.parse = parse
+        self.stats = stats or ReaderStats()
+        self.frame = bytearray(FRAME_LENGTH)
+        self.position = 0
+        self.start_us = 0
+
+    @property
+    def resyncs(self):
+        return self.stats.resyncs
+
+    def reset(self):
+        self.position = 0
+
+    def feed(self, data, received_us=None):
+        # received_us is when data arrived, it defaults to now
+        frames = []
+        frame = self.frame
+        position = self.position
+        stats = self.stats
+        stats.bytes += len(data)
+        if received_us is None:
+            received_us = ticks_us()
+
+        for byte in data:
+            if byte == FRAME_HEADER:
+                if position:
+                    stats.resyncs += 1
+                    stats.drops[DROP_LENGTH] += 1
+                frame[0] = byte
+                position = 1
+                self.start_us = received_us
+            elif position:
+                frame[position] = byte
+                position += 1
+
+                if position == FRAME_LENGTH:
+                    if byte != FRAME_STOP:
+                        stats.resyncs += 1
+                        stats.drops[DROP_STOP] += 1
+                    elif self.parse is None:
+                        frames.append(bytes(frame))
+                        stats.decoded(self.start_us)
+                    else:
+                        result = self.parse(frame)
+                        if result is not None:
+                            frames.append(result)
+                            stats.decoded(self.start_us)
+                    position = 0
+                elif byte == FRAME_STOP:
+                    stats.resyncs += 1
+                    stats.drops[DROP_LENGTH] += 1
+                    position = 0
+            else:
+                stats.skipped += 1
+
+        self.position = position
+        return frames
+
+
+class UARTCapture:
+    # Drains the UART into a ring buffer from the RX idle interrupt, or from a
+    # thread on the second core on firmware without UART.IRQ_RXIDLE, so that
+    # readers can sleep until data arrives instead of polling uart.read().
+    # received_us is when the oldest unread bytes were drained.
+    def __init__(self, uart, size=256):
+        self.uart = uart
+        self.ring = RingBuffer(size)
+        self.chunk = bytearray(32)
+        self.flag = ThreadSafeFlag()
+        self.running = True
+        self.received_us = None
+
+        if hasattr(uart, "irq") and hasattr(UART, "IRQ_RXIDLE"):
+            uart.irq(handler=self.drain, trigger=UART.IRQ_RXIDLE)
+        else:
+            _thread.start_new_thread(self.drain_thread, ())
+
+    def drain(self, uart=None):
+        received = False
 
-import ubinascii
-from machine import UART, Pin, Timer
+        while True:
+            n = self.uart.readinto(self.chunk)
+            if not n:
+                break
+            if not self.ring.any():
+                self.received_us = ticks_us()
+            self.ring.put(self.chunk, n)
+            received = True
+
+        if received:
+            self.flag.set()
+
+    def drain_thread(self):
+        while self.running:
+            if self.uart.any():
+                self.drain()
+            else:
+                sleep_ms(1)
+
+    def stop(self):
+        self.running = False
+        if hasattr(self.uart, "irq") and hasattr(UART, "IRQ_RXIDLE"):
+            self.uart.irq(handler=None)
+
+    def read_wait(self, timeout_ms, cancel=None):
+        # idle() halts the core until the next interrupt, so waiting for a
+        # tag leaves the CPU asleep instead of spinning. The system tick wakes
+        # it every millisecond, which is also how often cancel is checked.
+        start_time = ticks_ms()
+        while not self.ring.any():
+            if ticks_diff(ticks_ms(), start_time) >= timeout_ms:
+                return None
+            if cancel is not None and cancel.cancelled:
+                return None
+            idle()
+
+        return self.ring.read()
+
+    def clear(self):
+        self.ring.clear()
+
+    async def read(self, n=-1):
+        while not self.ring.any():
+            await self.flag.wait()
+
+        return self.ring.read(None if n < 0 else n)
+
+
+class CancelToken:
+    # Stops a blocking read from outside the loop, e.g. from a Timer callback
+    # or the other core. Setting a bool is safe from an IRQ handler.
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def parse_chip_id(chip_id):
+    # Chip ids are exchanged as decimal strings, tags are compared as ints
+    try:
+        return int(chip_id)
+    except ValueError:
+        return None
+
+
+class TagDebouncer:
+    # The RDM6300 repeats the frame for as long as a tag stays in the field.
+    # Keeps the last-seen tick of the most recent tags in two fixed arrays, so
+    # a repeat is suppressed while it keeps arriving within window_ms, while a
+    # different tag is reported right away. When the table is full the least
+    # recently seen tag is evicted.
+    def __init__(self, window_ms=1000, capacity=8):
+        self.window_ms = window_ms
+        self.tags = array("I", bytes(4 * capacity))
+        self.seen = array("I", bytes(4 * capacity))
+        self.used = 0
+        self.suppressed = 0
+
+    def clear(self):
+        self.used = 0
+
+    def check(self, tag, now=None):
+        # Returns True if the tag should be reported
+        if now is None:
+            now = ticks_ms()
+
+        tags = self.tags
+        seen = self.seen
+        oldest = 0
+        for i in range(self.used):
+            if tags[i] == tag:
+                report = ticks_diff(now, seen[i]) >= self.window_ms
+                seen[i] = now
+                if not report:
+                    self.suppressed += 1
+                return report
+            if ticks_diff(seen[oldest], seen[i]) > 0:
+                oldest = i
+
+        if self.used < len(tags):
+            oldest = self.used
+            self.used += 1
+
+        tags[oldest] = tag
+        seen[oldest] = now
+        return True
+
+
+class TagCollector:
+    # Distinct tags seen during a batch read, with the time each one was first
+    # seen (ms after the collector was created) and the number of frames that
+    # carried it. The tables are allocated up front, tags beyond max_tags are
+    # only counted in dropped.
+    def __init__(self, max_tags=16):
+        self.tags = array("I", bytes(4 * max_tags))
+        self.first_seen = array("I", bytes(4 * max_tags))
+        self.hits = array("I", bytes(4 * max_tags))
+        self.count = 0
+        self.dropped = 0
+        self.start_time = ticks_ms()
+
+    def add(self, tag, now=None):
+        tags = self.tags
+        for i in range(self.count):
+            if tags[i] == tag:
+                self.hits[i] += 1
+                return
+
+        if self.count == len(tags):
+            self.dropped += 1
+            return
+
+        if now is None:
+            now = ticks_ms()
+
+        i = self.count
+        tags[i] = tag
+        self.first_seen[i] = ticks_diff(now, self.start_time)
+        self.hits[i] = 1
+        self.count = i + 1
+
+    def results(self):
+        # (tag, first_seen_ms, hits) in the order the tags were first seen
+        return [
+            (self.tags[i], self.first_seen[i], self.hits[i]) for i in range(self.count)
+        ]
 
 
 class RFIDReader:
-    def __init__(self, gpioPin, logEnabled=False):
+    def __init__(self, gpioPin, logEnabled=False, debounce_ms=1000):
         self.uart = UART(0)
         self.uart.init(
             baudrate=9600, bits=8, parity=None, stop=1, rx=Pin(gpioPin, mode=Pin.IN)
         )
 
-        self.read_allowed = True
-        self.last_chip_id = ""
-        self.log_enabled = logEnabled
+        self.capture = UARTCapture(self.uart)
+        self.init_state(logEnabled, debounce_ms)
 
-    def reset_last_chip(self, timer):
-        self.read_allowed = True
+    def init_state(self, logEnabled, debounce_ms):
+        # Decoding, debouncing and logging state, whatever the bytes come from
+        self.stats = ReaderStats()
+        self.decoder = FrameDecoder(self.parse_tag, self.stats)
+        self.debouncer = TagDebouncer(debounce_ms)
+        self.allowlist = None
         self.last_chip_id = ""
+        self.log_enabled = logEnabled
 
-    def start_reset_timer(self):
-        self.reset_timer = Timer()
-        self.reset_timer.deinit()
-        self.reset_timer.init(
-            period=1000, mode=Timer.PERIODIC, callback=self.reset_last_chip
-        )
-
-    def stop_reset_timer(self):
-        if self.reset_timer == None:
-            return
+    def is_allowed(self, tag):
+        # None while no allow-list is set, otherwise whether tag is on it
+        if self.allowlist is None:
+            return None
 
-        self.reset_timer.deinit()
-        self.reset_timer = None
+        return tag in self.allowlist
 
-    def parse_packet(self, packet):
-        length = 14
-        header = 0x02
-        stop_byte = 0x03
+    def discard_pending(self):
+        # Drop bytes that arrived while nobody was reading, so a new read
+        # does not report a tag that left the field long ago
+        self.decoder.reset()
+        self.capture.clear()
 
-        header_position = 0
-        stop_byte_position = 13
+    def read_tags(self, wait_ms=READ_WAIT_MS, cancel=None):
+        data = self.capture.read_wait(wait_ms, cancel)
 
-        raw_data_start = header_position + 1
-        raw_data_end = raw_data_start + 10
+        if data is None:
+            return ()
 
-        checksum_start = raw_data_end
-        checksum_end = checksum_start + 2
+        return self.decoder.feed(data, self.capture.received_us)
 
-        # check for the packet length
-        if len(packet) != length:
+    def parse_tag(self, packet):
+        # Validates the frame and decodes the card id as an int in one pass
+        # over the packet, without slicing or building intermediate strings.
+        if len(packet) != FRAME_LENGTH:
+            self.stats.drops[DROP_LENGTH] += 1
             self.log(
                 "WARNING: RFID packet has an invalid length ({}).".format(len(packet))
             )
@@ -56,131 +399,274 @@ class RFIDReader:
             return None
 
         # check for the packet header
-        if packet[header_position] != header:
+        if packet[0] != FRAME_HEADER:
+            self.stats.drops[DROP_HEADER] += 1
             self.log("WARNING: RFID packet header is invalid.")
             return None
 
         # check for the packet stop byte
-        if packet[stop_byte_position] != stop_byte:
+        if packet[13] != FRAME_STOP:
+            self.stats.drops[DROP_STOP] += 1
             self.log("WARNING: RFID packet stop byte is invalid.")
             return None
 
-        card_data = packet[raw_data_start:raw_data_end]  # raw bytes of the card data
-        checksum = packet[checksum_start:checksum_end]  # checksum sent by RFID reader
-        calculated_checksum = 0  # holds the checksum we calculate from the card id
+        # bytes 1-10 are five hex encoded data bytes, 11-12 the checksum
+        nibbles = HEX_NIBBLES
+        checksum = 0
+        tag = 0
+        for i in (1, 3, 5, 7, 9, 11):
+            high = nibbles[packet[i]]
+            low = nibbles[packet[i + 1]]
+
+            if (high | low) > 15:
+                self.stats.drops[DROP_HEX] += 1
+                self.log("WARNING: RFID packet contains invalid hex digits.")
+                return None
 
-        # loop through each byte in the card data and calculate the checksum by XORing them all
-        for x in ubinascii.unhexlify(card_data):
-            calculated_checksum = calculated_checksum ^ x
+            value = (high << 4) | low
+            if i == 11:
+                break
 
-        checksum_hex_int = int(chr(checksum[0]) + chr(checksum[1]), 16)
+            # the first data byte is the version and not part of the card id
+            checksum ^= value
+            if i > 1:
+                tag = (tag << 8) | value
 
         # check that the calculated checksum matches the one sent by the RFID reader
-        if checksum_hex_int != calculated_checksum:
+        if value != checksum:
+            self.stats.drops[DROP_CHECKSUM] += 1
             self.log("WARNING: RFID checksum verification failed.")
             return None
 
-        # if we get to here it means we received a valid packet
-        # lets remove the first byte (not part of the card ID) and convert it to a string
-        card_id = card_data[2:].decode("ascii")
+        return tag
+
+    def parse_packet(self, packet):
+        tag = self.parse_tag(packet)
 
         # return a string of the decimal (integer) representation
-        return str(int(card_id, 16))
+        return None if tag is None else str(tag)
+
+    def scan(self, timeout_ms=None, cancel=None):
+        # Yields decoded tags until timeout_ms has passed or cancel is set.
+        # Waits are capped by the remaining time and cut short by cancel, so
+        # the loop stops within a frame time of either.
+        start_time = ticks_ms()
+
+        while cancel is None or not cancel.cancelled:
+            wait_ms = READ_WAIT_MS
+            if timeout_ms is not None:
+                wait_ms = min(
+                    wait_ms, timeout_ms - ticks_diff(ticks_ms(), start_time)
+                )
+                if wait_ms <= 0:
+                    return
+
+            for tag in self.read_tags(wait_ms, cancel):
+                yield tag
+
+    def log_stopped(self, cancel, mode):
+        if cancel is not None and cancel.cancelled:
+            self.log("Cancelled {} read.".format(mode))
+        else:
+            self.log("Timeout reached for {} read.".format(mode))
+
+    def read_single_chip(self, timeout_ms=None, cancel=None):
+        self.discard_pending()
+
+        for tag in self.scan(timeout_ms, cancel):
+            self.last_chip_id = str(tag)
+            self.log("Single shot run: The chip id is:", tag)
+            return self.last_chip_id
+
+        self.log_stopped(cancel, "single chip")
+        return None
+
+    def detect_chip_with_id(self, target_id, timeout_ms=None, cancel=None):
+        self.discard_pending()
+        target_tag = parse_chip_id(target_id)
+
+        for tag in self.scan(timeout_ms, cancel):
+            if tag == target_tag:
+                self.last_chip_id = str(tag)
+                self.log("Run until {}: The chip id is:".format(target_id), tag)
+                return self.last_chip_id
+
+        self.log_stopped(cancel, "specific chip")
+        return None
+
+    def read_continuously(self, shouldStop=None, timeout_ms=None):
+        # shouldStop is a CancelToken, the read ends once it is cancelled
+        self.discard_pending()
+        self.debouncer.clear()
+
+        for tag in self.scan(timeout_ms, shouldStop):
+            if not self.debouncer.check(tag):
+                continue
 
-    def read_single_chip(self, timeout_ms=None):
-        self.read_allowed = True
-        start_time = time.ticks_ms()
+            self.last_chip_id = str(tag)
+            self.log("Run indefinitely: The chip id is:", tag)
+            yield self.last_chip_id
 
-        while True:
-            if (
-                timeout_ms is not None
-                and time.ticks_diff(time.ticks_ms(), start_time) > timeout_ms
-            ):
-                self.log("Timeout reached for single chip read.")
-                return None
+        self.log_stopped(shouldStop, "continuous chip")
 
-            data = self.uart.read()
+    def collect(self, window_ms, max_tags=16, cancel=None):
+        # Every distinct tag seen during window_ms, see TagCollector.results()
+        self.discard_pending()
+        collector = TagCollector(max_tags)
 
-            if data is not None and self.read_allowed:
-                parsed = self.parse_packet(data)
+        for tag in self.scan(window_ms, cancel):
+            collector.add(tag)
 
-                if parsed is None:
-                    # Handle errors here
-                    continue
+        self.log("Batch run: Collected {} chip ids.".format(collector.count))
+        return collector.results()
 
-                self.last_chip_id = parsed
-                self.read_allowed = False
+    def enable_logging(self):
+        self.log_enabled = True
 
-                self.log("Single shot run: The chip id is:", parsed)
-                return parsed
+    def disable_logging(self):
+        self.log_enabled = False
 
-    def detect_chip_with_id(self, target_id, timeout_ms=None):
-        self.read_allowed = True
-        start_time = time.ticks_ms()
+    def log(self, *args):
+        if self.log_enabled:
+            print("[RFIDReader]", *args)
 
-        while True:
-            if (
-                timeout_ms is not None
-                and time.ticks_diff(time.ticks_ms(), start_time) > timeout_ms
-            ):
-                self.log("Timeout reached for specific chip read.")
-                return None
-            data = self.uart.read()
 
-            if data is not None and self.read_allowed:
-                parsed = self.parse_packet(data)
+class AsyncRFIDReader(RFIDReader):
+    # Same read modes as RFIDReader, but waiting for UART data yields to the
+    # event loop until the capture layer signals new bytes. Any object with an
+    # async read(n) method (e.g. an asyncio.StreamReader) can stand in for it.
+    # Reads are stopped by cancelling the task awaiting them.
+    def __init__(self, gpioPin=None, logEnabled=False, stream=None, debounce_ms=1000):
+        if stream is None:
+            super().__init__(gpioPin, logEnabled, debounce_ms)
+            stream = self.capture
+        else:
+            self.uart = None
+            self.init_state(logEnabled, debounce_ms)
+
+        self.stream = stream
+        self.tags = []
+
+    def discard_pending(self):
+        # Also drops decoded tags that were not handed out yet
+        self.tags = []
+        self.decoder.reset()
+        if hasattr(self.stream, "clear"):
+            self.stream.clear()
+
+    async def next_tag(self):
+        while not self.tags:
+            data = await self.stream.read(64)
+            if not data:
+                raise EOFError("RFID stream closed")
+            received_us = getattr(self.stream, "received_us", None)
+            self.tags = self.decoder.feed(data, received_us)
+
+        return self.tags.pop(0)
+
+    async def _with_timeout(self, coro, timeout_ms):
+        if timeout_ms is None:
+            return await coro
+
+        try:
+            return await asyncio.wait_for(coro, timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            return None
 
-                if parsed is None:
-                    # Handle errors here
-                    continue
+    async def read_single_chip(self, timeout_ms=None):
+        self.discard_pending()
+        tag = await self._with_timeout(self.next_tag(), timeout_ms)
+        if tag is None:
+            self.log("Timeout reached for single chip read.")
+            return None
 
-                self.last_chip_id = parsed
+        self.last_chip_id = str(tag)
+        self.log("Single shot run: The chip id is:", tag)
+        return self.last_chip_id
 
-                if parsed == target_id:
-                    self.read_allowed = False
-                    self.log("Run until {}: The chip id is:".format(target_id), parsed)
-                    return parsed
+    async def _wait_for_tag(self, target_tag):
+        while True:
+            tag = await self.next_tag()
 
-    def read_continuously(self, shouldStop=False, timeout_ms=None):
-        self.read_allowed = True
-        start_time = time.ticks_ms()
+            if tag == target_tag:
+                return tag
 
-        self.start_reset_timer()
+    async def detect_chip_with_id(self, target_id, timeout_ms=None):
+        self.discard_pending()
+        tag = await self._with_timeout(
+            self._wait_for_tag(parse_chip_id(target_id)), timeout_ms
+        )
+        if tag is None:
+            self.log("Timeout reached for specific chip read.")
+            return None
 
-        while not shouldStop:
-            if not self.read_allowed:
-                continue
+        self.last_chip_id = str(tag)
+        self.log("Run until {}: The chip id is:".format(target_id), tag)
+        return self.last_chip_id
 
-            if (
-                timeout_ms is not None
-                and time.ticks_diff(time.ticks_ms(), start_time) > timeout_ms
-            ):
-                self.log("Timeout reached for continuous chip read.")
-                return None
+    def read_continuously(self, shouldStop=None, timeout_ms=None):
+        # Like RFIDReader.read_continuously(), the read also ends once the
+        # CancelToken shouldStop is cancelled
+        self.discard_pending()
+        return ContinuousRead(self, timeout_ms, shouldStop)
 
-            data = self.uart.read()
+    async def _collect_into(self, collector):
+        while True:
+            collector.add(await self.next_tag())
 
-            if data is not None:
-                parsed = self.parse_packet(data)
+    async def collect(self, window_ms, max_tags=16):
+        self.discard_pending()
+        collector = TagCollector(max_tags)
+        await self._with_timeout(self._collect_into(collector), window_ms)
 
-                if parsed is None:
-                    # Handle errors here
-                    continue
+        self.log("Batch run: Collected {} chip ids.".format(collector.count))
+        return collector.results()
 
-                self.last_chip_id = parsed
-                self.read_allowed = False
-                self.log("Run indefinitely: The chip id is:", parsed)
-                yield parsed
 
-    def enable_logging(self):
-        self.log_enabled = True
+class ContinuousRead:
+    # Async iterator behind AsyncRFIDReader.read_continuously(). MicroPython
+    # has no async generators, so the loop state lives on this object. Repeats
+    # of a tag still in the field are dropped by the reader's debouncer. With
+    # a cancel token, waits are capped at READ_WAIT_MS so that it is noticed.
+    def __init__(self, reader, timeout_ms, cancel=None):
+        self.reader = reader
+        self.timeout_ms = timeout_ms
+        self.cancel = cancel
+        self.start_time = ticks_ms()
+        reader.debouncer.clear()
 
-    def disable_logging(self):
-        self.log_enabled = False
+    def __aiter__(self):
+        return self
 
-    def log(self, *args):
-        if self.log_enabled:
-            print("[RFIDReader]", *args)
+    async def __anext__(self):
+        reader = self.reader
+
+        while True:
+            if self.cancel is not None and self.cancel.cancelled:
+                reader.log("Cancelled continuous chip read.")
+                raise StopAsyncIteration
+
+            remaining_ms = None
+            if self.timeout_ms is not None:
+                remaining_ms = self.timeout_ms - ticks_diff(ticks_ms(), self.start_time)
+                if remaining_ms <= 0:
+                    reader.log("Timeout reached for continuous chip read.")
+                    raise StopAsyncIteration
+
+            wait_ms = remaining_ms
+            if self.cancel is not None and (wait_ms is None or wait_ms > READ_WAIT_MS):
+                wait_ms = READ_WAIT_MS
+
+            tag = await reader._with_timeout(reader.next_tag(), wait_ms)
+            if tag is None:
+                continue
+
+            if not reader.debouncer.check(tag):
+                continue
+
+            reader.last_chip_id = str(tag)
+            reader.log("Run indefinitely: The chip id is:", tag)
+            return reader.last_chip_id
 
 
 # Example usage:
@@ -0,0 +1,66 @@
+class RingBuffer:
+    # Fixed-size byte ring for one producer (an IRQ handler or the capture
+    # thread) and one consumer. The producer only moves head and the consumer
+    # only moves tail, so neither side needs a lock. One slot is always left
+    # free so that a full ring can be told apart from an empty one.
+    def __init__(self, size):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.size = size
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def any(self):
+        return (self.head - self.tail) % self.size
+
+    def free(self):
+        return self.size - 1 - self.any()
+
+    def clear(self):
+        self.tail = self.head
+
+    def put(self, data, n=None):
+        if n is None:
+            n = len(data)
+
+        free = self.free()
+        if n > free:
+            self.dropped += n - free
+            n = free
+
+        head = self.head
+        first = min(n, self.size - head)
+        source = memoryview(data)
+        self.view[head : head + first] = source[:first]
+        if first < n:
+            self.view[: n - first] = source[first:n]
+
+        self.head = (head + n) % self.size
+        return n
+
+    def readinto(self, buf, n=None):
+        available = self.any()
+        if n is None or n > len(buf):
+            n = len(buf)
+        if n > available:
+            n = available
+
+        tail = self.tail
+        first = min(n, self.size - tail)
+        target = memoryview(buf)
+        target[:first] = self.view[tail : tail + first]
+        if first < n:
+            target[first:n] = self.view[: n - first]
+
+        self.tail = (tail + n) % self.size
+        return n
+
+    def read(self, n=None):
+        available = self.any()
+        if n is None or n > available:
+            n = available
+
+        data = bytearray(n)
+        self.readinto(data)
+        return bytes(data)
@@ -0,0 +1,221 @@
+import asyncio
+
+from utils.eventlog import MODE_BATCH, MODE_READ, EventLog
+from utils.rfid import TagCollector
+from utils.ticks import ticks_diff, ticks_ms
+
+# Passed as the tag to TagBus.wait() to take the first event of any tag.
+# Card ids are unsigned, so it never equals a real one.
+ANY_TAG = -1
+
+
+class Subscription:
+    # Bounded queue of (seq, tag, ticks_ms, allowed, mode) events for one
+    # client, allowed being None while the reader has no allow-list. When the
+    # queue is full the oldest event is dropped, so a slow client never holds
+    # up the reader or the other subscribers. mode is one of the MODE_ bits
+    # and tells the event log what kind of client was reading. A subscription
+    # is also an async iterator that ends after timeout_ms and unsubscribes
+    # when closed.
+    def __init__(self, bus, maxsize, timeout_ms=None, mode=0):
+        self.bus = bus
+        self.mode = mode
+        self.events = [None] * maxsize
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+        self.ready = asyncio.Event()
+        self.timeout_ms = timeout_ms
+        self.start_time = ticks_ms()
+
+    def put(self, event):
+        size = len(self.events)
+        if self.count == size:
+            self.head = (self.head + 1) % size
+            self.count -= 1
+            self.dropped += 1
+
+        self.events[(self.head + self.count) % size] = event
+        self.count += 1
+        self.ready.set()
+
+    async def _get(self):
+        while not self.count:
+            self.ready.clear()
+            await self.ready.wait()
+
+        event = self.events[self.head]
+        self.events[self.head] = None
+        self.head = (self.head + 1) % len(self.events)
+        self.count -= 1
+        return event
+
+    async def get(self, timeout_ms=None):
+        if timeout_ms is None:
+            return await self._get()
+
+        try:
+            return await asyncio.wait_for(self._get(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            return None
+
+    def remaining_ms(self):
+        if self.timeout_ms is None:
+            return None
+        return self.timeout_ms - ticks_diff(ticks_ms(), self.start_time)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            remaining_ms = self.remaining_ms()
+            if remaining_ms is not None and remaining_ms <= 0:
+                self.close()
+                raise StopAsyncIteration
+
+            event = await self.get(remaining_ms)
+            if event is not None:
+                return event
+
+    async def aclose(self):
+        self.close()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class TagBus:
+    # One background task reads the RFID reader and fans decoded tags out to
+    # every subscribed client. The task only runs while someone is subscribed.
+    # Every event goes into the event log, so a reconnecting client can
+    # resume from the last sequence number it saw. Replays are limited to the
+    # last replay_size events, older ones would be dropped by the queue.
+    # Events are also appended to the journal, if one is set.
+    def __init__(self, reader, queue_size=8, replay_size=16, log_size=256):
+        self.reader = reader
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.subscribers = []
+        self.collectors = []
+        self.waiters = []
+        self.task = None
+        self.log = EventLog(log_size)
+        self.journal = None
+        self.errors = 0
+        self.last_error = None
+
+    def replay(self, after_seq):
+        if after_seq > self.log.seq:
+            # the sequence restarted (e.g. after a reboot), replay everything
+            after_seq = 0
+
+        after_seq = max(after_seq, self.log.seq - self.replay_size)
+        return self.log.since(after_seq, self.replay_size)
+
+    def subscribe(self, timeout_ms=None, maxsize=None, last_seq=None, mode=0):
+        subscription = Subscription(
+            self, maxsize or self.queue_size, timeout_ms, mode
+        )
+        if last_seq is not None:
+            for event in self.replay(last_seq):
+                subscription.put(event)
+        self.subscribers.append(subscription)
+
+        if self.task is None:
+            self.reader.discard_pending()
+            self.task = asyncio.create_task(self.run())
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def publish(self, tag, subscribers=None):
+        if subscribers is None:
+            subscribers = self.subscribers
+
+        mode = 0
+        for subscription in subscribers:
+            mode |= subscription.mode
+
+        seq = self.log.append(tag, ticks_ms(), self.reader.is_allowed(tag), mode)
+        event = self.log.event(seq)
+        if self.journal is not None:
+            self.journal.append(event)
+
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def dispatch(self, tag):
+        # Repeats of a tag that stays in the field are dropped by the reader's
+        # debouncer, other tags are published as soon as they are decoded.
+        # A card that is already in the field is still news to a one-shot
+        # waiter, so a repeat it waits for is published to the waiters only.
+        for collector in self.collectors:
+            collector.add(tag)
+
+        if self.reader.debouncer.check(tag):
+            self.publish(tag)
+        elif self.waiters:
+            waiting = [
+                subscription
+                for wanted, subscription in self.waiters
+                if wanted == ANY_TAG or wanted == tag
+            ]
+            if waiting:
+                self.publish(tag, waiting)
+
+    async def run(self):
+        # An error while handling one tag (e.g. an OSError of the allow-list
+        # file) is counted in errors and the next tag is handled as usual. If
+        # the reader itself fails the task ends, and the next subscriber
+        # starts a new one.
+        self.reader.debouncer.clear()
+
+        try:
+            while True:
+                tag = await self.reader.next_tag()
+                try:
+                    self.dispatch(tag)
+                except Exception as exc:
+                    self.errors += 1
+                    self.last_error = repr(exc)
+        finally:
+            if self.task is asyncio.current_task():
+                self.task = None
+
+    async def collect(self, window_ms, max_tags=16):
+        # Batch read: every frame decoded during window_ms is counted, before
+        # debouncing, into a TagCollector. The subscription only keeps the
+        # reader task running for the length of the window.
+        collector = TagCollector(max_tags)
+        subscription = self.subscribe(window_ms, mode=MODE_BATCH)
+        self.collectors.append(collector)
+
+        try:
+            await asyncio.sleep(window_ms / 1000)
+        finally:
+            self.collectors.remove(collector)
+            subscription.close()
+
+        return collector
+
+    async def wait(self, tag=ANY_TAG, timeout_ms=None):
+        # First event for tag (or of any tag) within the timeout, or None
+        subscription = self.subscribe(timeout_ms, mode=MODE_READ)
+        waiter = (tag, subscription)
+        self.waiters.append(waiter)
+
+        try:
+            async for event in subscription:
+                if tag == ANY_TAG or event[1] == tag:
+                    return event
+        finally:
+            self.waiters.remove(waiter)
+            subscription.close()
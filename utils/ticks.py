@@ -0,0 +1,31 @@
+import time
+
+# ticks_ms(), ticks_us() and ticks_diff() of MicroPython's time module. On
+# CPython the ticks wrap at 2**30 like they do on the board (and in
+# host/utime.py), so they always fit the "I" arrays they are stored in and
+# code that subtracts them without ticks_diff() fails on the host too.
+try:
+    ticks_ms = time.ticks_ms
+    ticks_us = time.ticks_us
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+    sleep_ms = time.sleep_ms
+except AttributeError:  # CPython
+    TICKS_PERIOD = 1 << 30
+    TICKS_MAX = TICKS_PERIOD - 1
+    TICKS_HALF = TICKS_PERIOD // 2
+
+    def ticks_ms():
+        return (time.monotonic_ns() // 1000000) & TICKS_MAX
+
+    def ticks_us():
+        return (time.monotonic_ns() // 1000) & TICKS_MAX
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    def ticks_diff(ticks1, ticks2):
+        return ((ticks1 - ticks2 + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
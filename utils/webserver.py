@@ -1,25 +1,64 @@
+import asyncio
+import json
+from array import array
+
 import config.webserver_conf as CONF
-from microdot import Microdot
+from microdot import Microdot, Request, send_file
+from microdot.websocket import with_websocket
 from static.rfid_test import HTML_CONTENT
+from utils.allowlist import AllowList, FlashAllowList
+from utils.eventlog import MODE_GATE, MODE_STREAM, MODE_WEBSOCKET, mode_names
+from utils.journal import Journal, JournalExport
 from utils.led import DualColorLED
-from utils.logger import Logger
-from utils.rfid import RFIDReader
+from utils.logger import FileSink, HTTPSink, Logger, LogRing, StreamSink
+from utils.metrics import Metrics
+from utils.rfid import AsyncRFIDReader, parse_chip_id
+from utils.tagbus import TagBus
 
 app = Microdot()
-logger = Logger(CONF.LOG_LEVEL)
-reader = RFIDReader(CONF.RFID_READER_GPIO)
+app.metrics = Metrics()
+log_ring = LogRing(CONF.LOG_RING_SIZE)
+log_ring.sinks.append(StreamSink())
+if CONF.LOG_FILE is not None:
+    log_ring.sinks.append(FileSink(CONF.LOG_FILE))
+if CONF.LOG_HTTP_HOST is not None:
+    log_ring.sinks.append(HTTPSink(CONF.LOG_HTTP_HOST, CONF.LOG_HTTP_PORT))
+logger = Logger(CONF.LOG_LEVEL, ring=log_ring)
+reader = AsyncRFIDReader(CONF.RFID_READER_GPIO)
+bus = TagBus(reader)
 led = DualColorLED(CONF.LED_GREEN_GPIO, CONF.LED_RED_GPIO)
+allowlist = AllowList()
+reader.allowlist = allowlist
+journal = Journal(CONF.JOURNAL_PATH, CONF.JOURNAL_MAX_SIZE)
+bus.journal = journal
 
 DEFAULT_TIMEOUT = 30
+HEARTBEAT_MS = 15000
+BATCH_WINDOW_MS = 1000
+MAX_BATCH_WINDOW_MS = 60000
+BATCH_MAX_TAGS = 16
+MAX_BATCH_TAGS = 64
+EVENTS_LIMIT = 50
+MAX_EVENTS_LIMIT = 100
+MAX_ALLOWLIST_TAGS = 8192
+ACCESS_LED_MS = 1000
+MAX_LED_PATTERN = 32
+MAX_LED_TIMES = 100
+MAX_TAG = 0xFFFFFFFF
+MAX_TAG_LINE = 16  # ten digits, a "\r" and some blanks
+TAG_LINES_CHUNK = 512
+
+# allow-list uploads are up to 11 bytes per card id and are read as a stream
+Request.max_content_length = MAX_ALLOWLIST_TAGS * 11
 
 
 def get_client_timeout(req):
     clientTimeout = req.form.get("timeout") if req.form is not None else None
 
-    logger.debug(f"Client timeout is {clientTimeout}")
+    logger.debug("Client timeout is {}", clientTimeout)
     timeout = int(clientTimeout) if clientTimeout is not None else DEFAULT_TIMEOUT
 
-    logger.debug(f"Using timeout set to {timeout}")
+    logger.debug("Using timeout set to {}", timeout)
     return timeout
 
 
@@ -33,6 +72,255 @@ def get_response(chip_id: str | None, successful: bool):
     )
 
 
+def get_int_arg(req, name, default, maximum, minimum=1):
+    # Integer query argument in minimum..maximum, or None if it is invalid
+    value = req.args.get(name)
+    if value is None:
+        return default
+
+    try:
+        value = int(value)
+    except ValueError:
+        return None
+
+    return value if minimum <= value <= maximum else None
+
+
+def get_batch_data(collector):
+    return {
+        "tags": [
+            {"id": str(tag), "first_seen_ms": first_seen, "hits": hits}
+            for tag, first_seen, hits in collector.results()
+        ],
+        "dropped": collector.dropped,
+    }
+
+
+def get_event_data(event):
+    data = {"found": True, "id": str(event[1]), "seq": event[0]}
+    if event[3] is not None:
+        data["allowed"] = event[3]
+    return data
+
+
+def get_log_data(event):
+    seq, tag, ticks, allowed, mode = event
+    data = {"seq": seq, "id": str(tag), "ticks_ms": ticks, "mode": mode_names(mode)}
+    if allowed is not None:
+        data["allowed"] = allowed
+    return data
+
+
+def parse_tag_ids(chip_ids):
+    # Card ids given as ints or decimal strings, or None if one is invalid
+    tags = array("I")
+    for chip_id in chip_ids:
+        tag = chip_id if isinstance(chip_id, int) else parse_chip_id(chip_id)
+        if tag is None or not 0 <= tag <= MAX_TAG:
+            return None
+        tags.append(tag)
+
+    return tags
+
+
+async def read_tag_lines(req):
+    # Card ids from a text body with one decimal id per line. Bodies over
+    # Request.max_body_length are not buffered, so they are read in chunks of
+    # at most the bytes left, never past the content length, and a line cut
+    # by a chunk is carried over to the next one.
+    tags = array("I")
+    remaining = req.content_length
+    partial = b""
+
+    while partial is not None and len(tags) <= MAX_ALLOWLIST_TAGS:
+        chunk = b""
+        if remaining > 0:
+            chunk = await req.stream.read(min(remaining, TAG_LINES_CHUNK))
+        if chunk:
+            remaining -= len(chunk)
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()
+            if len(partial) > MAX_TAG_LINE:
+                return None
+        else:
+            # the last id may not end with a newline
+            lines = [partial]
+            partial = None
+
+        for line in lines:
+            line = line.strip()
+            if line:
+                tag = parse_chip_id(line.decode())
+                if tag is None or not 0 <= tag <= MAX_TAG:
+                    return None
+                tags.append(tag)
+
+    return tags
+
+
+class AccessGate:
+    # While the allow-list has entries the reader runs all the time and every
+    # tag is answered on the LED right away: green if it is allowed, red if
+    # it is not.
+    def __init__(self):
+        self.subscription = None
+        self.task = None
+
+    def update(self):
+        if len(allowlist) and self.task is None:
+            self.subscription = bus.subscribe(mode=MODE_GATE)
+            self.task = asyncio.create_task(self.run())
+        elif not len(allowlist) and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.subscription.close()
+            self.subscription = None
+
+    async def run(self):
+        async for event in self.subscription:
+            logger.debug("Access {} for {}", event[3], event[1])
+            if event[3]:
+                led.green_on(ACCESS_LED_MS)
+            else:
+                led.red_on(ACCESS_LED_MS)
+
+
+gate = AccessGate()
+
+
+class TagEventStream:
+    # Server-Sent Events body for /read/stream. Each tag event carries the bus
+    # sequence number as its id, so EventSource clients resume after a
+    # reconnect through Last-Event-ID. Heartbeat comments keep idle proxies
+    # open and make a vanished client fail a write, after which Microdot
+    # calls aclose() and the subscription (and with it the reader) stops.
+    # The bus is only subscribed to once the body is iterated, which HEAD
+    # requests and failed header writes never do.
+    def __init__(self, timeout_ms, last_seq=None, heartbeat_ms=HEARTBEAT_MS):
+        self.timeout_ms = timeout_ms
+        self.last_seq = last_seq
+        self.heartbeat_ms = heartbeat_ms
+        self.subscription = None
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+
+        if self.subscription is None:
+            self.subscription = bus.subscribe(
+                timeout_ms=self.timeout_ms, last_seq=self.last_seq, mode=MODE_STREAM
+            )
+            return "retry: 1000\n\n"
+
+        remaining_ms = self.subscription.remaining_ms()
+        if remaining_ms is not None and remaining_ms <= 0:
+            await self.aclose()
+            raise StopAsyncIteration
+
+        wait_ms = self.heartbeat_ms
+        if remaining_ms is not None and remaining_ms < wait_ms:
+            wait_ms = remaining_ms
+
+        event = await self.subscription.get(wait_ms)
+        if event is None:
+            return ": heartbeat\n\n"
+
+        data = json.dumps(get_event_data(event))
+        return "id: {}\nevent: tag\ndata: {}\n\n".format(event[0], data)
+
+    async def aclose(self):
+        self.closed = True
+        if self.subscription is not None:
+            self.subscription.close()
+
+
+class ReaderSession:
+    # State of one /ws client. Tag events are forwarded while the client has
+    # started a scan, and control commands are applied to the shared reader.
+    def __init__(self, ws):
+        self.ws = ws
+        self.subscription = None
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.subscription = bus.subscribe(mode=MODE_WEBSOCKET)
+            self.task = asyncio.create_task(self.forward())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.subscription.close()
+            self.subscription = None
+
+    async def forward(self):
+        try:
+            async for event in self.subscription:
+                await self.ws.send(json.dumps(get_event_data(event)))
+        except OSError:
+            # the client went away, the receive loop cleans up
+            pass
+
+    def handle(self, message):
+        try:
+            command = json.loads(message)
+            cmd = command["cmd"]
+        except (ValueError, TypeError, KeyError):
+            return {"ok": False, "error": "invalid command"}
+
+        if cmd == "start":
+            self.start()
+        elif cmd == "stop":
+            self.stop()
+        elif cmd == "debounce":
+            debounce_ms = command.get("ms")
+            if not isinstance(debounce_ms, int) or debounce_ms < 0:
+                return {"ok": False, "error": "invalid debounce window"}
+            reader.debouncer.window_ms = debounce_ms
+        elif cmd == "led":
+            pattern = command.get("pattern")
+            time_ms = command.get("time_ms", 100)
+            n_times = command.get("n_times", 1)
+            if pattern is None:
+                led.stop_blink()
+            elif command.get("color") not in ("green", "red"):
+                return {"ok": False, "error": "invalid LED color"}
+            elif not isinstance(pattern, str) or not pattern:
+                return {"ok": False, "error": "invalid LED pattern"}
+            elif len(pattern) > MAX_LED_PATTERN:
+                return {"ok": False, "error": "LED pattern too long"}
+            elif not isinstance(time_ms, int) or time_ms < 1:
+                return {"ok": False, "error": "invalid LED step time"}
+            elif not isinstance(n_times, int) or not 1 <= n_times <= MAX_LED_TIMES:
+                return {"ok": False, "error": "invalid LED repeat count"}
+            else:
+                led.blink(
+                    command["color"],
+                    pattern,
+                    time_ms,
+                    continuous=bool(command.get("continuous", False)),
+                    n_times=n_times,
+                )
+        else:
+            return {"ok": False, "error": "unknown command"}
+
+        return {"ok": True, "cmd": cmd}
+
+
+def get_last_event_id(req):
+    last_event_id = req.headers.get("Last-Event-ID")
+
+    try:
+        return int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        return None
+
+
 @app.route("/")
 async def hello(req):
     return HTML_CONTENT, 200, {"Content-Type": "text/html"}
@@ -43,50 +331,223 @@ async def read_single_chip(req):
     timeout = get_client_timeout(req)
 
     led.blink("green", "+-", 100, continuous=True)
-    chip_id_result = reader.read_single_chip(timeout_ms=timeout * 1000)
+    event = await bus.wait(timeout_ms=timeout * 1000)
     led.stop_blink()
-    logger.debug(f"Read returned with data {chip_id_result}")
+    logger.debug("Read returned with data {}", event)
 
-    if chip_id_result is None:
+    if event is None:
         led.red_on(2000)
         return get_response(None, False)
 
-    return get_response(chip_id_result, True)
+    return get_response(str(event[1]), True)
 
 
 @app.route("/read/chip/<chip_id>", methods=["GET"])
 async def wait_for_chip(req, chip_id):
+    tag = parse_chip_id(chip_id)
+    if tag is None or not 0 <= tag <= MAX_TAG:
+        return {"error": "invalid card id"}, 400
+
     timeout = get_client_timeout(req)
 
     led.blink("green", "+-", 100, continuous=True)
-    chip_id_result = reader.detect_chip_with_id(
-        target_id=chip_id, timeout_ms=timeout * 1000
-    )
+    event = await bus.wait(tag=tag, timeout_ms=timeout * 1000)
     led.stop_blink()
-    logger.debug(f"Read returned with data {chip_id_result}")
+    logger.debug("Read returned with data {}", event)
 
-    if chip_id_result is None:
+    if event is None:
         led.red_on(2000)
         return get_response(chip_id, False)
 
-    return get_response(chip_id_result, True)
+    return get_response(str(event[1]), True)
+
+
+@app.route("/read/batch", methods=["GET"])
+async def read_batch(req):
+    window_ms = get_int_arg(req, "window_ms", BATCH_WINDOW_MS, MAX_BATCH_WINDOW_MS)
+    max_tags = get_int_arg(req, "max_tags", BATCH_MAX_TAGS, MAX_BATCH_TAGS)
+    if window_ms is None or max_tags is None:
+        return {"error": "invalid window_ms or max_tags"}, 400
+
+    led.blink("green", "+-", 100, continuous=True)
+    collector = await bus.collect(window_ms, max_tags)
+    led.stop_blink()
+    logger.debug("Batch read collected {} tags", collector.count)
+
+    data = get_batch_data(collector)
+    data["window_ms"] = window_ms
+    return data
+
+
+@app.route("/events", methods=["GET"])
+async def get_events(req):
+    # Pages through the event log: events after seq "since", oldest first.
+    # Clients pass the returned "next" as since to fetch the following page.
+    since = get_int_arg(req, "since", 0, 0xFFFFFFFF, minimum=0)
+    limit = get_int_arg(req, "limit", EVENTS_LIMIT, MAX_EVENTS_LIMIT)
+    if since is None or limit is None:
+        return {"error": "invalid since or limit"}, 400
+
+    events = bus.log.since(since, limit)
+    return {
+        "events": [get_log_data(event) for event in events],
+        "first": bus.log.first_seq(),
+        "next": events[-1][0] if events else min(since, bus.log.seq),
+    }
+
+
+@app.route("/logs", methods=["GET"])
+async def get_logs(req):
+    # Pages through the log ring like /events pages through the event log
+    since = get_int_arg(req, "since", 0, 0xFFFFFFFF, minimum=0)
+    limit = get_int_arg(req, "limit", EVENTS_LIMIT, MAX_EVENTS_LIMIT)
+    if since is None or limit is None:
+        return {"error": "invalid since or limit"}, 400
+
+    lines = log_ring.since(since, limit)
+    return {
+        "logs": [{"seq": seq, "line": line.decode().rstrip()} for seq, line in lines],
+        "first": log_ring.floor,
+        "next": lines[-1][0] if lines else min(since, log_ring.seq),
+        "dropped": log_ring.dropped,
+    }
+
+
+@app.route("/reader/stats", methods=["GET"])
+async def get_reader_stats(req):
+    # Decode counters since boot, see ReaderStats in utils/rfid.py
+    stats = reader.stats.as_dict()
+    stats["suppressed"] = reader.debouncer.suppressed
+    stats["journal_errors"] = journal.errors
+    stats["journal_dropped"] = journal.dropped
+    stats["bus_errors"] = bus.errors
+    return stats
+
+
+@app.route("/metrics", methods=["GET"])
+async def get_metrics(req):
+    # Request counts, latency histograms and bytes written per route, in the
+    # Prometheus text format
+    return (
+        app.metrics.export(),
+        200,
+        {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+@app.route("/events/export", methods=["GET"])
+async def export_events(req):
+    # The journal as a binary download, see utils/journal.py for the format
+    export = JournalExport(journal)
+    res = send_file(
+        "journal.bin",
+        content_type="application/octet-stream",
+        stream=export,
+        max_age=0,
+    )
+    res.headers["Content-Length"] = str(export.length)
+    return res
+
+
+@app.route("/allowlist", methods=["GET"])
+async def get_allowlist(req):
+    return {"count": len(allowlist)}
+
+
+@app.route("/allowlist", methods=["PUT"])
+async def replace_allowlist(req):
+    # Bulk upload, the body replaces the whole list
+    tags = await read_tag_lines(req)
+    if tags is None:
+        return {"error": "invalid card id"}, 400
+    if len(tags) > MAX_ALLOWLIST_TAGS:
+        return {"error": "too many card ids"}, 413
+
+    allowlist.replace(tags)
+    gate.update()
+    logger.info("Allow-list replaced with {} cards", len(allowlist))
+    return {"count": len(allowlist)}
+
+
+@app.route("/allowlist", methods=["PATCH"])
+async def update_allowlist(req):
+    # Delta update: {"add": [...], "remove": [...]}
+    try:
+        data = req.json
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return {"error": "expected a JSON object"}, 400
+
+    add = parse_tag_ids(data.get("add", ()))
+    remove = parse_tag_ids(data.get("remove", ()))
+    if add is None or remove is None:
+        return {"error": "invalid card id"}, 400
+    if len(add) > MAX_ALLOWLIST_TAGS:
+        return {"error": "too many card ids"}, 413
+
+    allowlist.update(add, remove)
+    gate.update()
+    return {"count": len(allowlist)}
+
+
+@app.route("/allowlist/<chip_id>", methods=["GET"])
+async def check_allowlist(req, chip_id):
+    tag = parse_chip_id(chip_id)
+    return {"id": chip_id, "allowed": tag is not None and tag in allowlist}
 
 
 @app.route("/read/stream", methods=["GET"])
 async def read_continuous(req):
     timeout = get_client_timeout(req)
 
-    def continuous_chip_reader():
-        for id in reader.read_continuously(timeout_ms=timeout * 1000):
-            yield f'{{"found": True, "id": {id}}}\n'
+    return (
+        TagEventStream(timeout * 1000, get_last_event_id(req)),
+        200,
+        {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"},
+    )
 
-    return continuous_chip_reader()
 
+@app.route("/ws")
+@with_websocket
+async def reader_socket(req, ws):
+    session = ReaderSession(ws)
 
-def start_rfid_api_webserver():
-    logger.info("Starting webserver at {}:{}".format(CONF.HOST, CONF.PORT))
+    try:
+        while True:
+            reply = session.handle(await ws.receive())
+            await ws.send(json.dumps(reply))
+    finally:
+        session.stop()
+
+
+def load_allowlist():
+    # Switch to the allow-list kept in flash, so it survives a reboot and is
+    # not limited by RAM. Uploads from then on are written to the file.
+    global allowlist
+
+    try:
+        allowlist = FlashAllowList(CONF.ALLOWLIST_PATH)
+    except ValueError as error:
+        logger.error("Not loading the allow-list: {}", error)
+        return
+
+    reader.allowlist = allowlist
+    logger.info("Loaded allow-list with {} cards", len(allowlist))
 
+
+async def main():
     # Signal that the webserver is booting...
     led.blink("red", "+-+---", time_ms=200, n_times=2)
 
-    app.run(host=CONF.HOST, port=CONF.PORT, debug=CONF.MICRODOT_DEBUG)
+    load_allowlist()
+    gate.update()
+    asyncio.create_task(journal.run())
+    asyncio.create_task(log_ring.run())
+
+    await app.start_server(host=CONF.HOST, port=CONF.PORT, debug=CONF.MICRODOT_DEBUG)
+
+
+def start_rfid_api_webserver():
+    logger.info("Starting webserver at {}:{}", CONF.HOST, CONF.PORT)
+    asyncio.run(main())